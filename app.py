@@ -1,38 +1,134 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, send_from_directory
+from flask import Flask, Response, g, render_template, request, redirect, url_for, jsonify, send_from_directory
 import json
 import os
 import time
 import threading
 import random
 import requests
+from requests.adapters import HTTPAdapter
 import argparse
-from datetime import datetime, timedelta
+import heapq
+import logging
+import logging.handlers
+import re
+import sqlite3
+import sys
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import hmac
+from bisect import bisect_left
+from datetime import datetime
+from urllib.parse import urlsplit
+import pishock
 from pishock import PiShockAPI
+import switchbot.client
 from switchbot import SwitchBot
 from collections import deque
+from contextlib import closing
+from collections.abc import Mapping
+from types import MappingProxyType
+try:
+    import numpy as np
+except ImportError:  # Optional: only the Monte Carlo scene preview needs it
+    np = None
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this'
 
 SETTINGS_FILE = 'data/settings.json'
 SCENE_STATE_FILE = 'data/scene_state.json'
+SWITCHBOT_QUOTA_FILE = 'data/switchbot_quota.json'
+STOP_LATENCY_TARGET = 0.5  # Seconds allowed between a stop request and scene teardown starting
+UNLOCK_RETRIES = 3  # Attempts for the lock disengage webhook before giving up
+UNLOCK_RETRY_DELAY = 0.5  # Seconds between disengage attempts (multiplied by the attempt number)
+UNLOCK_WAIT_TIMEOUT = 60  # Seconds the scene thread waits for the release before finishing teardown
+KILLSWITCH_POLL_INTERVAL = 1.0  # Seconds between killswitch plug checks during a scene
+CONTACT_SENSOR_POLL_INTERVAL = 0.5  # Seconds between contact sensor checks during a scene
+CONTACT_SENSOR_RECONCILE_INTERVAL = 30  # Seconds between contact sensor checks when SwitchBot pushes events
+SWITCHBOT_STATUS_TTL = 0.4  # Seconds a fetched SwitchBot status is reused instead of calling the API again
+SWITCHBOT_MAX_PARALLEL = 4  # Concurrent SwitchBot status requests
+SWITCHBOT_DAILY_QUOTA = 10000  # SwitchBot cloud API requests allowed per day
+SWITCHBOT_QUOTA_RESERVE = 300  # Requests held back for tests, modifiers and the next scene
+SWITCHBOT_QUOTA_FLUSH_CALLS = 200  # Requests counted in memory before the quota counter is written to disk
+SWITCHBOT_QUOTA_FLUSH_INTERVAL = 300  # Longest (seconds) counted requests wait in memory before being written
+SWITCHBOT_QUOTA_RETUNE_INTERVAL = 30  # Seconds between polling cadence adjustments during a scene
+SWITCHBOT_MAX_POLL_INTERVAL = 60  # Slowest a watched SwitchBot device is polled when the budget is short
+ACTIVATION_TIMELINE_SIZE = 2000  # Activation records kept per scene for /activation_timeline
+ACTUATOR_MAX_PENDING = 1  # Queued (not yet started) activations per device; extra firings are collapsed
+MIN_ACTIVATION_INTERVAL = 1  # Shortest time (seconds) between a device's planned activations; 0 s intervals are raised to this
+PISHOCK_NOTIFY_LEAD = 2  # Seconds between the PiShock pre-notification and the vibration
+PISHOCK_SHOCK_GAP = 1  # Seconds between the PiShock vibration and the shock
+SIMULATION_MAX_ACTIVATIONS = 100000  # Activations after which a virtual-clock scene simulation gives up
+SCENE_RECORDINGS_DIR = 'data/recordings'  # One JSON file per scene run: seed, config, random draws and outside events
+SCENE_RECORDINGS_KEEP = 20  # Most recent scene recordings kept for /replay_scene
+MONTE_CARLO_SAMPLES = 2000  # Scenes sampled by /scene_preview by default
+MONTE_CARLO_MAX_SAMPLES = 20000  # Upper limit for ?samples=
+MONTE_CARLO_MAX_CELLS = 1_000_000  # Scene-seconds sampled per batch (bounds memory use on the Pi)
+HTTP_CONNECT_TIMEOUT = 3.05  # Seconds to establish a connection for webhooks/custom accessories
+HTTP_READ_TIMEOUT = 10  # Seconds to wait for a response
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+HTTP_POOL_MAXSIZE = 4  # Keep-alive connections kept per host
+STATUS_MESSAGE_BUFFER_SIZE = 50  # Status log lines kept for the dashboard
+NOTIFICATION_BUFFER_SIZE = 10  # Popup/audio notifications kept for clients that are catching up
+LONG_POLL_MAX_WAIT = 25  # Longest a client may hold a ?wait= request open (seconds)
+SSE_HEARTBEAT_INTERVAL = 15  # Seconds between keep-alive comments on idle /events streams
+SSE_CLIENT_QUEUE_SIZE = 100  # Events buffered per /events client before it is dropped (it reconnects)
+HTTP_PREWARM_LEAD = 5  # Seconds before the initial delay ends to open connections to the lock/accessory hosts
+CONFIG_STAT_INTERVAL = 1.0  # Seconds between on-disk change checks for cached config files
+CONFIG_FSYNC = True  # fsync config writes before/after the atomic rename (safer on power loss, slower on SD cards)
+SCENE_STATE_FLUSH_DELAY = 2.0  # Seconds to batch scene state changes into a single write (0 = write immediately)
+JOURNAL_FILE = 'data/journal.sqlite3'  # Event journal: status lines, activations, sensor edges, modifiers, killswitch
+JOURNAL_QUEUE_SIZE = 10000  # Events buffered for the journal writer; beyond this events are dropped, never waited on
+JOURNAL_BATCH_SIZE = 500  # Most events written in one transaction
+JOURNAL_FLUSH_INTERVAL = 0.5  # Seconds the writer collects events before a write (how far the database lags)
+JOURNAL_RETENTION_DAYS = 90  # Events older than this are deleted
+JOURNAL_PRUNE_INTERVAL = 3600  # Seconds between deletions of expired events
+JOURNAL_PAGE_SIZE = 100  # Events per /journal page by default
+JOURNAL_MAX_PAGE_SIZE = 1000  # Upper limit for ?limit=
+LOG_FILE = 'data/logs/pilock.jsonl'  # Structured (JSON lines) log written by the background log thread
+LOG_MAX_BYTES = 1_000_000  # Size at which the log file is rotated
+LOG_BACKUP_COUNT = 3  # Rotated log files kept (caps the log at roughly 4 MB on the SD card)
+LOG_QUEUE_SIZE = 10000  # Records buffered for the log thread; beyond this records are dropped, never waited on
+LOG_LEVELS = {  # Per-subsystem log levels; override with PILOCK_LOG_LEVELS="sensor=DEBUG,device=WARNING"
+    'pilock': 'INFO',
+    'pilock.scene': 'INFO',
+    'pilock.device': 'INFO',
+    'pilock.sensor': 'INFO',
+    'pilock.modifier': 'INFO',
+    'pilock.lock': 'INFO',
+    'pilock.api': 'INFO',
+    'pilock.config': 'INFO',
+    'pilock.status': 'INFO',  # Feeds the dashboard status log and journal: never above INFO, not changed by all=
+    'pilock.notify': 'INFO',
+    'pilock.journal': 'INFO',
+}
+PROFILER_INTERVAL = 0.01  # Seconds between profiler samples (developer mode)
+PROFILER_MAX_DEPTH = 64  # Innermost frames kept per sampled stack
+PROFILER_MAX_STACKS = 5000  # Distinct stacks kept per profile; further new stacks are counted as '(other)'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # Histogram bucket bounds (seconds)
 
 # Ensure data directory exists
 os.makedirs('data', exist_ok=True)
 
 scene_thread = None
-contact_sensor_monitor_thread = None  # Thread for monitoring contact sensors
 scene_active = False
-scene_end_time = None
-scene_delay_end_time = None  # When delay phase ends
+scene_end_time = None  # When scene ends (time.monotonic() seconds, immune to wall clock steps)
+scene_delay_end_time = None  # When delay phase ends (time.monotonic() seconds)
 scene_in_delay = False  # Track if scene is in initial delay phase
-scene_execution_start_time = None  # When actual scene execution starts
+scene_execution_start_time = None  # When actual scene execution starts (time.monotonic() seconds)
+last_stop_latency = None  # Seconds from the last stop request until scene teardown started
+scene_lock_release = None  # LockRelease for the current (or last) scene
+activation_timeline = None  # ActivationTimeline of the current (or last) scene
+scene_random = None  # SceneRandom of the current (or last) scene
+scene_recorder = None  # SceneRecorder of the current (or last) scene
+scene_report = None  # SceneReport collecting measurements while a scene runs
+last_unlock = None  # Outcome and latency of the last lock release
 executed_modifiers = set()  # Track which modifiers have been executed (reset each scene)
-status_messages = deque(maxlen=50)  # Keep last 50 status messages
-popup_notification_queue = deque(maxlen=10)  # Queue for popup notifications
-audio_notification_queue = deque(maxlen=10)  # Queue for audio notifications
 contact_sensor_states = {}  # Global state tracking for contact sensors
-contact_sensor_devices = {}  # Global device references for contact sensors
+contact_sensor_devices = {}  # Global sensor number -> device ID for monitored contact sensors
+contact_sensor_lock = threading.Lock()  # Serializes open-edge detection across poller/API threads
+switchbot_poller = None  # SwitchBotStatusPoller for the current (or last) scene
 monitoring_switchbot_api = None  # Global switchbot API reference for monitoring thread
 monitoring_pishock_api = None  # Global pishock API reference for modifier actions
 monitoring_pishock_shockers = {}  # Global pishock device references for modifier actions
@@ -51,13 +147,672 @@ def load_version():
         pass
     return '0.0.0'  # fallback version
 
-def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, 'r') as f:
-            return json.load(f)
-    
-    # Create default settings file if it doesn't exist
-    default_settings = {
+class Metric:
+    """Base for the /metrics collectors: one value series per label combination"""
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._series = {}  # label values tuple -> series state
+        metrics_registry.append(self)
+
+    def _labels(self, values, extra=''):
+        pairs = [f'{name}="{value}"' for name, value in zip(self.label_names, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = [(key, list(state) if isinstance(state, list) else state) for key, state in self._series.items()]
+        for key, state in sorted(series):
+            lines.extend(self._render_series(key, state))
+        return lines
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{self._labels(key)} {value}']
+
+    def set_total(self, value, *labels):
+        """Mirror a running total that is counted elsewhere"""
+        with self._lock:
+            self._series[labels] = value
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._series[labels] = value
+
+    def _render_series(self, key, value):
+        return [f'{self.name}{self._labels(key)} {value}']
+
+class Histogram(Metric):
+    """Fixed-bucket histogram; observe() is a bisect plus a few additions under a lock"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = buckets
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._series.get(labels)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), then sum and count
+                state = self._series[labels] = [0] * (len(self.buckets) + 3)
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def _render_series(self, key, state):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), state):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f'{self.name}_bucket{self._labels(key, le)} {cumulative}')
+        lines.append(f'{self.name}_sum{self._labels(key)} {state[-2]:.6f}')
+        lines.append(f'{self.name}_count{self._labels(key)} {state[-1]}')
+        return lines
+
+metrics_registry = []
+device_call_seconds = Histogram('pilock_device_call_seconds', 'Latency of device and API calls by call type and outcome',
+                                ('call', 'outcome'))
+scene_tick_lag_seconds = Histogram('pilock_scene_tick_lag_seconds', 'How late device activations were dispatched by the scene loop')
+scene_tick_jitter_seconds = Histogram('pilock_scene_tick_jitter_seconds', 'Change in dispatch lag between consecutive activations')
+contact_sensor_modifier_seconds = Histogram('pilock_contact_sensor_modifier_seconds',
+                                            'Time from detecting a contact sensor opening until its modifiers ran', ('source',))
+http_request_seconds = Histogram('pilock_http_request_seconds', 'Flask request handling time by route',
+                                 ('route', 'method', 'status'))
+config_operations = Counter('pilock_config_operations_total', 'Config loads and writes by store and result',
+                            ('store', 'operation'))
+switchbot_quota_remaining = Gauge('pilock_switchbot_quota_remaining', 'SwitchBot API requests left today')
+log_records_dropped = Counter('pilock_log_records_dropped_total', 'Log records discarded because the log queue was full')
+journal_events_dropped = Counter('pilock_journal_events_dropped_total',
+                                 'Journal events discarded because the writer fell behind or a write failed')
+
+class CallTimer:
+    """Times one device/API call into pilock_device_call_seconds.
+
+    The outcome is 'ok' unless the code sets it, an exception escapes ('error') or the
+    scene is cancelled while waiting ('cancelled').
+    """
+    __slots__ = ('call', 'start', 'outcome')
+
+    def __init__(self, call):
+        self.call = call
+        self.outcome = 'ok'
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.outcome = 'cancelled' if issubclass(exc_type, SceneCancelled) else 'error'
+        seconds = time.monotonic() - self.start
+        device_call_seconds.observe(seconds, self.call, self.outcome)
+        report = scene_report
+        if report is not None:
+            report.observe_call(self.call, self.outcome, seconds)
+        return False
+
+def timed_call(call, func, *args, **kwargs):
+    """Run func(*args, **kwargs) under a CallTimer"""
+    with CallTimer(call):
+        return func(*args, **kwargs)
+
+# Logging: every subsystem logs through a 'pilock.*' logger. Records are handed to a
+# bounded queue and written (console + rotating JSON lines file) by a background
+# thread, so scene and sensor threads never wait on stdout or the SD card.
+
+SECRET_SETTING_KEYS = ('token', 'secret', 'api_key', 'webhook_key')
+SECRET_URL_PATTERN = re.compile(r'([?&](?:key|token|secret|api_?key|apikey|password|sig)=|/with/key/)[^&/?\s]+', re.IGNORECASE)
+REDACTED = '***'
+
+def collect_secrets(value, key=''):
+    """Credential strings found in a settings tree (tokens, API keys, sharecodes, webhook keys)"""
+    if isinstance(value, Mapping):
+        for child_key, child in value.items():
+            yield from collect_secrets(child, str(child_key))
+    elif isinstance(value, str) and len(value) >= 4 and (key in SECRET_SETTING_KEYS or key.startswith('sharecode')):
+        yield value
+
+class LogRedactor(logging.Filter):
+    """Masks configured credentials and key-like URL parameters in log records"""
+
+    def __init__(self):
+        super().__init__()
+        self.source = None  # ConfigStore whose credentials are masked (set once settings_store exists)
+        self._snapshot = None
+        self._secrets = ()
+
+    def _current_secrets(self):
+        snapshot = self.source.peek() if self.source is not None else None
+        if snapshot is not self._snapshot:
+            # Longest first so a secret containing another is masked whole
+            self._secrets = tuple(sorted(set(collect_secrets(snapshot)), key=len, reverse=True))
+            self._snapshot = snapshot
+        return self._secrets
+
+    def redact(self, text):
+        for secret in self._current_secrets():
+            if secret in text:
+                text = text.replace(secret, REDACTED)
+        return SECRET_URL_PATTERN.sub(lambda match: match.group(1) + REDACTED, text)
+
+    def filter(self, record):
+        record.msg = self.redact(record.getMessage())
+        record.args = None
+        status_text = getattr(record, 'status_text', None)
+        if status_text:
+            record.status_text = self.redact(status_text)
+        return True
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, subsystem, thread and message"""
+
+    def format(self, record):
+        return json.dumps({
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'subsystem': record.name.partition('.')[2] or record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage()
+        })
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when the log thread falls behind"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+def configure_logging():
+    """Set per-subsystem levels and start the background log writer; returns the QueueListener"""
+    levels = dict(LOG_LEVELS)
+    invalid = []
+    for item in os.environ.get('PILOCK_LOG_LEVELS', '').split(','):
+        subsystem, _, level = item.strip().partition('=')
+        if not subsystem:
+            continue
+        if not isinstance(logging.getLevelName(level.upper()), int):
+            invalid.append(item.strip())
+        elif subsystem in ('pilock', 'all'):
+            # Every subsystem except the status feed, which is product output rather than diagnostics
+            levels.update({name: level.upper() for name in levels if name != 'pilock.status'})
+        else:
+            levels[f'pilock.{subsystem}'] = level.upper()
+    status_pinned = logging.getLevelName(levels['pilock.status']) > logging.INFO
+    if status_pinned:
+        levels['pilock.status'] = 'INFO'
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    root = logging.getLogger('pilock')
+    root.propagate = False  # Keep PiLock records out of Flask/werkzeug's handlers
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter('%(message)s'))
+    console_handler.addFilter(log_redactor)
+    handlers = [console_handler]
+    try:
+        os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES,
+                                                            backupCount=LOG_BACKUP_COUNT, encoding='utf-8', delay=True)
+    except OSError as e:
+        file_handler = None
+        print(f"LOGGING ERROR: Cannot write {LOG_FILE}, logging to console only - {e}")
+    if file_handler is not None:
+        file_handler.setFormatter(JsonLineFormatter())
+        file_handler.addFilter(log_redactor)
+        handlers.append(file_handler)
+
+    # Redaction and formatting run on the listener thread, off the callers' hot paths
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    root.addHandler(LogQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    if invalid:
+        root.warning(f"LOGGING: Ignoring invalid PILOCK_LOG_LEVELS entries: {', '.join(invalid)}")
+    if status_pinned:
+        root.warning("LOGGING: Keeping status at INFO - a higher level would empty the dashboard status feed")
+    return listener
+
+log_redactor = LogRedactor()
+log_listener = configure_logging()
+scene_log = logging.getLogger('pilock.scene')  # Scene lifecycle, scheduling, timeline
+device_log = logging.getLogger('pilock.device')  # PiShock, SwitchBot presses, custom accessories, webhooks
+sensor_log = logging.getLogger('pilock.sensor')  # Contact sensors, killswitch, SwitchBot polling/quota
+modifier_log = logging.getLogger('pilock.modifier')
+lock_log = logging.getLogger('pilock.lock')
+api_log = logging.getLogger('pilock.api')  # Outbound HTTP and update checks
+config_log = logging.getLogger('pilock.config')
+status_log = logging.getLogger('pilock.status')  # Dashboard status log (see add_status_message)
+notify_log = logging.getLogger('pilock.notify')  # Popup/audio notifications
+journal_log = logging.getLogger('pilock.journal')  # SQLite event journal writer
+
+def thread_cpu_time(ident):
+    """CPU seconds used so far by another thread, or None where the platform can't tell"""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+class SamplingProfiler:
+    """Statistical profiler for the scene, SwitchBot poller, actuator and request threads.
+
+    Threads opt in with track(role). While running, a background thread wakes every
+    interval, reads the registered threads' stacks (sys._current_frames) and CPU clocks,
+    and aggregates collapsed stacks for flamegraphs plus per-function self/total wall and
+    CPU time. Nothing is traced between samples, so overhead stays low enough for a dry run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = {}  # thread ident -> role
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset(PROFILER_INTERVAL)
+
+    def _reset(self, interval):
+        self.interval = interval
+        self.started_at = None
+        self.stopped_at = None
+        self.samples = 0
+        self.sampling_seconds = 0.0  # Time spent inside the sampler itself
+        self._stacks = {}  # (role, code, ...) outermost first -> sample count
+        self._functions = {}  # code -> [samples, self wall, total wall, self cpu, total cpu]
+        self._cpu_seen = {}  # ident -> last CPU clock reading
+
+    def track(self, role):
+        """Register the calling thread for sampling under role"""
+        self._threads[threading.get_ident()] = role
+
+    def untrack(self):
+        self._threads.pop(threading.get_ident(), None)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=PROFILER_INTERVAL):
+        """Start a fresh profile; returns False if one is already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self._reset(interval)
+            self.started_at = time.monotonic()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+            self._thread.start()
+        scene_log.info(f"PROFILER: Started ({interval * 1000:.0f} ms interval)")
+        return True
+
+    def stop(self):
+        """Stop sampling; the collected profile stays available until the next start"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return False
+        self._stop.set()
+        thread.join()
+        self.stopped_at = time.monotonic()
+        scene_log.info(f"PROFILER: Stopped after {self.samples} samples")
+        return True
+
+    def _run(self):
+        last = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            self._sample(now - last)
+            last = now
+            self.sampling_seconds += time.monotonic() - now
+
+    def _sample(self, wall):
+        frames = sys._current_frames()
+        with self._lock:
+            for ident, role in list(self._threads.items()):
+                frame = frames.get(ident)
+                if frame is None:
+                    # Thread has exited without untracking (e.g. executor workers)
+                    self._threads.pop(ident, None)
+                    self._cpu_seen.pop(ident, None)
+                    continue
+                cpu_now = thread_cpu_time(ident)
+                cpu_before = self._cpu_seen.get(ident)
+                cpu = cpu_now - cpu_before if cpu_now is not None and cpu_before is not None else 0.0
+                self._cpu_seen[ident] = cpu_now
+
+                codes = []
+                while frame is not None and len(codes) < PROFILER_MAX_DEPTH:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                key = (role, *codes)
+                if key in self._stacks or len(self._stacks) < PROFILER_MAX_STACKS:
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+                else:
+                    self._stacks[(role, None)] = self._stacks.get((role, None), 0) + 1
+
+                for code in set(codes):
+                    stats = self._functions.get(code)
+                    if stats is None:
+                        stats = self._functions[code] = [0, 0.0, 0.0, 0.0, 0.0]
+                    stats[0] += 1
+                    stats[2] += wall
+                    stats[4] += cpu
+                if codes:
+                    leaf = self._functions[codes[-1]]
+                    leaf[1] += wall
+                    leaf[3] += cpu
+            self.samples += 1
+
+    @staticmethod
+    def _label(code):
+        if code is None:
+            return '(other)'
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def collapsed(self):
+        """Profile in collapsed-stack format (flamegraph.pl, speedscope, inferno)"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        lines = [';'.join([key[0]] + [self._label(code) for code in key[1:]]) + f' {count}'
+                 for key, count in stacks]
+        return '\n'.join(sorted(lines)) + '\n'
+
+    def functions(self, sort='total_wall', limit=50):
+        """Per-function table; times in milliseconds, 'self' excludes time spent in callees"""
+        with self._lock:
+            items = [(code, list(stats)) for code, stats in self._functions.items()]
+        rows = [{
+            'function': code.co_name,
+            'location': f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}",
+            'samples': stats[0],
+            'self_wall_ms': round(stats[1] * 1000, 1),
+            'total_wall_ms': round(stats[2] * 1000, 1),
+            'self_cpu_ms': round(stats[3] * 1000, 1),
+            'total_cpu_ms': round(stats[4] * 1000, 1)
+        } for code, stats in items]
+        sort_key = f'{sort}_ms'
+        if sort_key not in ('self_wall_ms', 'total_wall_ms', 'self_cpu_ms', 'total_cpu_ms'):
+            sort_key = 'total_wall_ms'
+        rows.sort(key=lambda row: row[sort_key], reverse=True)
+        return rows[:limit]
+
+    def stats(self):
+        with self._lock:
+            end = self.stopped_at if not self.running and self.stopped_at else time.monotonic()
+            duration = end - self.started_at if self.started_at is not None else 0.0
+            return {
+                'running': self.running,
+                'interval_ms': round(self.interval * 1000, 1),
+                'duration_seconds': round(duration, 1),
+                'samples': self.samples,
+                'stacks': len(self._stacks),
+                'tracked_threads': sorted(self._threads.values()),
+                'overhead_percent': round(self.sampling_seconds / duration * 100, 2) if duration else 0.0
+            }
+
+def profiled(role, func):
+    """Wrap a thread target so the profiler samples it under role while it runs"""
+    def run(*args, **kwargs):
+        profiler.track(role)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.untrack()
+    return run
+
+profiler = SamplingProfiler()
+
+def freeze_config(value):
+    """Recursively wrap dicts in read-only views so cached config can be shared between threads"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze_config(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze_config(item) for item in value)
+    return value
+
+def thaw_config(value):
+    """Convert a frozen config snapshot back into plain, JSON serializable dicts and lists"""
+    if isinstance(value, Mapping):
+        return {key: thaw_config(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw_config(item) for item in value]
+    return value
+
+def atomic_write_text(path, text, fsync=True):
+    """Write a file via temp file + rename so readers never see a truncated file"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if fsync:
+        # Persist the rename itself
+        dir_fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+class ConfigStore:
+    """Process-wide in-memory cache of a JSON config file.
+
+    Readers get a shared read-only snapshot. The file is only re-parsed when its
+    mtime/size/inode signature changes, and the signature is checked at most once
+    every CONFIG_STAT_INTERVAL seconds. Saves update the cache in place.
+
+    Writes are atomic (temp file + rename, optionally fsynced). With a non-zero
+    flush_delay, saves are written behind: every save within the window is merged
+    into a single flush, and flushes whose content matches the file are skipped.
+    """
+
+    def __init__(self, name, path, default_factory, flush_delay=0, fsync=CONFIG_FSYNC):
+        self.name = name
+        self.path = path
+        self.default_factory = default_factory
+        self.flush_delay = flush_delay
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._snapshot = None
+        self._signature = None
+        self._last_check = 0.0
+        self._written_text = None
+        self._generation = 0  # Bumped on every save, used to detect saves racing a flush
+        self._dirty = False
+        self._flush_timer = None
+        self.hits = 0
+        self.disk_reads = 0
+        self.disk_writes = 0
+        self.skipped_writes = 0
+        self.coalesced_saves = 0
+        self.external_reloads = 0
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _load_locked(self):
+        """Refresh the snapshot if needed; returns (snapshot, needs_flush). Caller holds _lock"""
+        now = time.monotonic()
+        if self._snapshot is not None and (self._dirty or now - self._last_check < CONFIG_STAT_INTERVAL):
+            # Pending write-behind changes always win over the file on disk
+            self.hits += 1
+            return self._snapshot, False
+
+        self._last_check = now
+        signature = self._file_signature()
+        if self._snapshot is not None and signature == self._signature:
+            self.hits += 1
+            return self._snapshot, False
+
+        if signature is None:
+            # Create default file if it doesn't exist
+            self._snapshot = freeze_config(self.default_factory())
+            self._generation += 1
+            self._dirty = True
+            return self._snapshot, True
+
+        try:
+            with open(self.path, 'r') as f:
+                text = f.read()
+            data = json.loads(text)
+        except ValueError as e:
+            if self._snapshot is None:
+                raise
+            config_log.error(f"CONFIG ERROR: {self.name} could not be parsed, keeping cached copy - {e}")
+            self._signature = signature
+            return self._snapshot, False
+
+        self.disk_reads += 1
+        if self._snapshot is not None:
+            self.external_reloads += 1
+            config_log.info(f"CONFIG: {self.name} changed on disk - reloaded")
+        self._signature = signature
+        self._written_text = text
+        self._snapshot = freeze_config(data)
+        return self._snapshot, False
+
+    def _save_locked(self, data):
+        """Replace the snapshot; returns True if the caller must flush immediately. Caller holds _lock"""
+        snapshot = freeze_config(thaw_config(data))
+        if snapshot == self._snapshot and not self._dirty:
+            self.skipped_writes += 1
+            return False
+        self._snapshot = snapshot
+        self._last_check = time.monotonic()
+        self._generation += 1
+        if self._dirty:
+            self.coalesced_saves += 1
+        self._dirty = True
+        if self.flush_delay <= 0:
+            return True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+        return False
+
+    # flush() takes _write_lock before _lock, so it is always called after releasing _lock
+
+    def load(self):
+        """Return the current read-only snapshot, re-reading the file only if it changed"""
+        with self._lock:
+            snapshot, needs_flush = self._load_locked()
+        if needs_flush:
+            self.flush()
+        return snapshot
+
+    def save(self, data):
+        """Make a full config dict the cached snapshot and persist it (immediately or write-behind)"""
+        with self._lock:
+            needs_flush = self._save_locked(data)
+        if needs_flush:
+            self.flush()
+
+    def update(self, changes):
+        """Merge top-level keys into the current config and persist the result"""
+        with self._lock:
+            snapshot, needs_flush = self._load_locked()
+            data = thaw_config(snapshot)
+            data.update(changes)
+            needs_flush = self._save_locked(data) or needs_flush
+        if needs_flush:
+            self.flush()
+
+    def flush(self):
+        """Write pending changes to disk now; no-op if nothing is pending or the content is unchanged"""
+        with self._write_lock:
+            with self._lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                if not self._dirty:
+                    return
+                generation = self._generation
+                text = json.dumps(thaw_config(self._snapshot), indent=2)
+
+            if text != self._written_text:
+                try:
+                    # Disk I/O happens outside _lock so readers never wait on slow flash
+                    atomic_write_text(self.path, text, self.fsync)
+                except OSError as e:
+                    config_log.error(f"CONFIG ERROR: Failed to write {self.name} - {e}")
+                    with self._lock:
+                        if self.flush_delay > 0 and self._flush_timer is None:
+                            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                            self._flush_timer.daemon = True
+                            self._flush_timer.start()
+                    return
+                written = True
+            else:
+                written = False
+
+            with self._lock:
+                if written:
+                    self.disk_writes += 1
+                    self._written_text = text
+                    self._signature = self._file_signature()
+                else:
+                    self.skipped_writes += 1
+                if generation == self._generation:
+                    self._dirty = False
+
+    def reset(self):
+        """Delete the file so the next load recreates the defaults"""
+        with self._write_lock, self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._snapshot = None
+            self._signature = None
+            self._written_text = None
+            self._dirty = False
+
+    def peek(self):
+        """The cached snapshot without checking the file (None before the first load)"""
+        return self._snapshot
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_reads': self.disk_reads,
+                'disk_writes': self.disk_writes,
+                'skipped_writes': self.skipped_writes,
+                'coalesced_saves': self.coalesced_saves,
+                'external_reloads': self.external_reloads,
+                'pending_write': self._dirty
+            }
+
+def default_settings():
+    return {
         'switchbot': {
             'token': '', 'secret': '',
             'device_1_id': '', 'device_2_id': '', 'device_3_id': '', 'device_4_id': ''
@@ -85,26 +840,13 @@ def load_settings():
             'endpoint_4': '', 'payload_4': '{}', 'method_4': 'POST'
         },
         'contact_sensors': {
-            'sensor_1_id': '', 'sensor_2_id': '', 'sensor_3_id': '', 'sensor_4_id': ''
+            'sensor_1_id': '', 'sensor_2_id': '', 'sensor_3_id': '', 'sensor_4_id': '',
+            'webhook_key': ''
         }
     }
-    
-    with open(SETTINGS_FILE, 'w') as f:
-        json.dump(default_settings, f, indent=2)
-    
-    return default_settings
-
-def save_settings(settings):
-    with open(SETTINGS_FILE, 'w') as f:
-        json.dump(settings, f, indent=2)
 
-def load_scene_state():
-    if os.path.exists(SCENE_STATE_FILE):
-        with open(SCENE_STATE_FILE, 'r') as f:
-            return json.load(f)
-    
-    # Create default scene state file if it doesn't exist
-    default_scene_state = {
+def default_scene_state():
+    return {
         'scene_duration_type': 'fixed',
         'scene_duration_fixed': 5,
         'scene_duration_random_min': 2,
@@ -243,20 +985,408 @@ def load_scene_state():
         'modifier_4_contact_sensor': '',
         'modifier_4_target_custom': ''
     }
-    
-    with open(SCENE_STATE_FILE, 'w') as f:
-        json.dump(default_scene_state, f, indent=2)
-    
-    return default_scene_state
+
+settings_store = ConfigStore('settings', SETTINGS_FILE, default_settings)
+log_redactor.source = settings_store
+scene_state_store = ConfigStore('scene_state', SCENE_STATE_FILE, default_scene_state,
+                                flush_delay=SCENE_STATE_FLUSH_DELAY)
+atexit.register(scene_state_store.flush)  # Don't lose write-behind changes on shutdown
+replay_scene_state = None  # Config of the scene being replayed; only in memory, never written to scene_state.json
+replay_scene_state_lock = threading.Lock()
+# Not fsynced: losing a few counted requests on power loss is harmless, rewriting the SD card every few seconds isn't
+switchbot_quota_store = ConfigStore('switchbot_quota', SWITCHBOT_QUOTA_FILE, lambda: {'date': '', 'calls': 0},
+                                    flush_delay=SWITCHBOT_QUOTA_FLUSH_INTERVAL, fsync=False)
+atexit.register(switchbot_quota_store.flush)
+
+def load_settings():
+    """Return a read-only snapshot of the settings (cached in memory)"""
+    return settings_store.load()
+
+def save_settings(settings):
+    settings_store.save(settings)
+
+def load_scene_state():
+    """Return a read-only snapshot of the scene state (cached in memory; the replayed config during a replay)"""
+    snapshot = replay_scene_state
+    return snapshot if snapshot is not None else scene_state_store.load()
 
 def save_scene_state(state):
-    with open(SCENE_STATE_FILE, 'w') as f:
-        json.dump(state, f, indent=2)
+    scene_state_store.save(state)
+    publish_device_states()
+
+def update_scene_state(changes):
+    """Apply a dict of changed keys to the stored scene state (or, during a replay, to the replayed config)"""
+    global replay_scene_state
+    with replay_scene_state_lock:
+        if replay_scene_state is not None:
+            state = thaw_config(replay_scene_state)
+            state.update(changes)
+            replay_scene_state = freeze_config(state)
+            changes = None
+    if changes is not None:
+        scene_state_store.update(changes)
+    publish_device_states()
+
+class EventBroadcaster:
+    """Fans dashboard events out to every connected /events stream"""
+
+    class Client:
+        __slots__ = ('queue', 'dropped')
+
+        def __init__(self):
+            self.queue = queue.Queue(maxsize=SSE_CLIENT_QUEUE_SIZE)
+            self.dropped = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = set()
+
+    def subscribe(self):
+        client = self.Client()
+        with self._lock:
+            self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.discard(client)
+
+    def client_count(self):
+        return len(self._clients)
+
+    @staticmethod
+    def format(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def publish(self, event, data):
+        if not self._clients:
+            return  # Nobody listening; skip the serialization
+        message = self.format(event, data)  # Serialized once for all clients
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.queue.put_nowait(message)
+            except queue.Full:
+                # Stalled client: end its stream, the browser reconnects and gets a fresh snapshot
+                client.dropped = True
+                self.unsubscribe(client)
+
+event_broadcaster = EventBroadcaster()
+last_published_device_states = None
+dashboard_epoch = time.time_ns()  # Part of the /snapshot ETag so a restart never matches an old one
+dashboard_version = 0  # Bumped whenever anything /snapshot reports changes
+dashboard_version_lock = threading.Lock()
+
+def bump_dashboard_version():
+    global dashboard_version
+    with dashboard_version_lock:
+        dashboard_version += 1
+
+def get_device_states(scene_state):
+    """Enabled flags of all devices, keyed by device type and number"""
+    return {
+        'pishock': {i: scene_state.get(f'pishock_{i}_enabled', False) for i in range(1, 5)},
+        'switchbot': {i: scene_state.get(f'switchbot_{i}_enabled', False) for i in range(1, 5)},
+        'custom': {i: scene_state.get(f'custom_{i}_enabled', False) for i in range(1, 5)}
+    }
+
+def publish_device_states():
+    """Push device enable flags to /events clients if they changed"""
+    global last_published_device_states
+    states = get_device_states(load_scene_state())
+    if states != last_published_device_states:
+        last_published_device_states = states
+        bump_dashboard_version()
+        event_broadcaster.publish('device_states', states)
+
+def current_device_states():
+    """Device enable flags as last published (no config read once the app is running)"""
+    global last_published_device_states
+    if last_published_device_states is None:
+        last_published_device_states = get_device_states(load_scene_state())  # First read, not a change
+    return last_published_device_states
+
+def get_scene_status_event():
+    """Scene status plus the wall-clock deadline so browsers can run the countdown themselves"""
+    status = get_scene_status()
+    deadline = scene_delay_end_time if scene_in_delay else scene_end_time
+    now = time.time()
+    status['ends_at'] = now + max(0, deadline - time.monotonic()) if status['status'] != 'Idle' and deadline else None
+    status['server_time'] = now
+    return status
+
+def publish_scene_status():
+    """Push a scene status transition (start, delay end, extension, stop) to /events clients"""
+    bump_dashboard_version()
+    event_broadcaster.publish('status', get_scene_status_event())
+
+class SequenceBuffer:
+    """Thread-safe ring buffer that numbers every entry so each reader can keep its own cursor"""
+
+    def __init__(self, maxlen):
+        self._entries = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.last_seq = 0
+        self.epoch = time.time_ns()  # Changes on restart and clear() so readers know to drop what they hold
+
+    def append(self, item, seq=None):
+        """Add an entry; seq overrides the next number (must keep increasing)"""
+        with self._cond:
+            self.last_seq = self.last_seq + 1 if seq is None else seq
+            self._entries.append((self.last_seq, item))
+            self._cond.notify_all()
+            return self.last_seq
+
+    def clear(self):
+        with self._cond:
+            self._entries.clear()
+            self.epoch += 1
+            self._cond.notify_all()
+
+    def after(self, seq):
+        """Entries newer than seq as (seq, item) pairs, plus the latest seq and the epoch"""
+        with self._cond:
+            if seq > self.last_seq:
+                seq = 0  # Cursor from before a restart; start over
+            return [(s, item) for s, item in self._entries if s > seq], self.last_seq, self.epoch
+
+    def wait_after(self, seq, timeout):
+        """Like after(), but blocks up to timeout seconds for a newer entry (or a clear)"""
+        with self._cond:
+            epoch = self.epoch
+            self._cond.wait_for(lambda: self.last_seq != seq or self.epoch != epoch, timeout)
+        return self.after(seq)
+
+class EventJournal:
+    """Persistent SQLite journal of status lines, activations, sensor edges, modifiers and killswitch
+    events, plus one report per scene.
+
+    record() only numbers the event and queues it. A background thread writes the queue in
+    batches, one transaction each, so scene, device and poller threads never wait on the SD
+    card. Rows reach the database within JOURNAL_FLUSH_INTERVAL; when the writer falls behind,
+    events are dropped (and counted) rather than waited on.
+    """
+
+    SCHEMA = (
+        '''CREATE TABLE IF NOT EXISTS events (
+               id INTEGER PRIMARY KEY,
+               at REAL NOT NULL,
+               scene_id TEXT,
+               kind TEXT NOT NULL,
+               device TEXT,
+               message TEXT,
+               data TEXT
+           )''',
+        'CREATE INDEX IF NOT EXISTS events_scene ON events (scene_id, id)',
+        'CREATE INDEX IF NOT EXISTS events_device ON events (device, id)',
+        'CREATE INDEX IF NOT EXISTS events_kind ON events (kind, id)',
+        'CREATE INDEX IF NOT EXISTS events_at ON events (at)',
+        # Scene reports: the columns are the headline numbers for comparing scenes, report is the full JSON
+        '''CREATE TABLE IF NOT EXISTS scene_reports (
+               scene_id TEXT PRIMARY KEY,
+               started_at REAL NOT NULL,
+               seed INTEGER,
+               dry_run INTEGER NOT NULL,
+               end_reason TEXT,
+               planned_seconds REAL,
+               actual_seconds REAL,
+               activations INTEGER,
+               failures INTEGER,
+               lateness_p95_ms INTEGER,
+               unlock_ms INTEGER,
+               report TEXT NOT NULL
+           )''',
+        'CREATE INDEX IF NOT EXISTS scene_reports_started ON scene_reports (started_at)'
+    )
+    REPORT_COLUMNS = ('scene_id', 'started_at', 'seed', 'dry_run', 'end_reason', 'planned_seconds', 'actual_seconds',
+                      'activations', 'failures', 'lateness_p95_ms', 'unlock_ms')
+
+    def __init__(self, path):
+        self.path = path
+        self.scene_id = None  # Set while a scene runs; stored with every event
+        self._queue = queue.Queue(JOURNAL_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._thread = None
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute('PRAGMA journal_mode=WAL')  # Readers don't block the writer
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+                conn.commit()
+                self._last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+        except sqlite3.Error as e:
+            journal_log.error(f"JOURNAL ERROR: Cannot open {path} - {e}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute('PRAGMA synchronous=NORMAL')  # WAL stays consistent; fewer fsyncs on the SD card
+        return conn
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write what is queued, then stop the writer"""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(5)
+
+    def record(self, kind, message=None, device=None, data=None):
+        """Queue an event; returns its ID (IDs keep increasing across restarts)"""
+        with self._lock:
+            self._last_id += 1
+            event_id = self._last_id
+        try:
+            self._queue.put_nowait((event_id, time.time(), self.scene_id, kind, device, message, data))
+        except queue.Full:
+            journal_events_dropped.inc()
+        return event_id
+
+    def _run(self):
+        conn = self._connect()
+        next_prune = 0.0
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + JOURNAL_FLUSH_INTERVAL
+            while batch[-1] is not None and len(batch) < JOURNAL_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            stopping = batch[-1] is None
+            rows = [event[:6] + (None if event[6] is None else json.dumps(event[6]),)
+                    for event in batch if event is not None]
+            try:
+                with conn:
+                    conn.executemany('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+                    if time.monotonic() >= next_prune:
+                        cutoff = time.time() - JOURNAL_RETENTION_DAYS * 86400
+                        conn.execute('DELETE FROM events WHERE at < ?', (cutoff,))
+                        conn.execute('DELETE FROM scene_reports WHERE started_at < ?', (cutoff,))
+                        next_prune = time.monotonic() + JOURNAL_PRUNE_INTERVAL
+            except sqlite3.Error as e:
+                journal_events_dropped.inc(amount=len(rows))
+                journal_log.error(f"JOURNAL ERROR: Failed to write {len(rows)} events - {e}")
+        conn.close()
+
+    def query(self, scene_id=None, device=None, kind=None, before=None, after=None, since=None, until=None,
+              limit=JOURNAL_PAGE_SIZE):
+        """Events matching every given filter, newest first. before/after are event IDs (pass the
+        smallest ID of a page as before= for the next one), since/until are Unix times."""
+        filters = (('scene_id = ?', scene_id), ('device = ?', device), ('kind = ?', kind), ('id < ?', before),
+                   ('id > ?', after), ('at >= ?', since), ('at < ?', until))
+        clauses = [clause for clause, value in filters if value is not None]
+        params = [value for clause, value in filters if value is not None]
+        sql = 'SELECT id, at, scene_id, kind, device, message, data FROM events'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql + ' ORDER BY id DESC LIMIT ?', params + [limit]).fetchall()
+        return [{
+            'id': event_id,
+            'at': at,
+            'time': datetime.fromtimestamp(at).isoformat(timespec='milliseconds'),
+            'scene_id': scene_id,
+            'kind': kind,
+            'device': device,
+            'message': message,
+            'data': json.loads(data) if data else None
+        } for event_id, at, scene_id, kind, device, message, data in rows]
+
+    def save_report(self, report):
+        """Store a scene report (once per scene, after teardown, so it is written directly)"""
+        failures = (sum(sum(outcomes.values()) for outcomes in report['failures']['activations'].values())
+                    + sum(report['failures']['calls'].values()))
+        row = (report['scene_id'], datetime.fromisoformat(report['started_at']).timestamp(), report['seed'],
+               report['dry_run'], report['end_reason'], report['duration']['planned_with_extensions_seconds'],
+               report['duration']['actual_seconds'], report['activations']['total'], failures,
+               report['activations']['lateness_p95_ms'], report['lock']['trigger_to_unlock_ms'], json.dumps(report))
+        with closing(self._connect()) as conn:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO scene_reports VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', row)
+
+    def reports(self, limit=10):
+        """Headline numbers of the newest scene reports, newest first"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT {', '.join(self.REPORT_COLUMNS)} FROM scene_reports "
+                                'ORDER BY started_at DESC LIMIT ?', (limit,)).fetchall()
+        reports = [dict(zip(self.REPORT_COLUMNS, row)) for row in rows]
+        for report in reports:
+            report['started_at'] = datetime.fromtimestamp(report['started_at']).isoformat(timespec='seconds')
+            report['dry_run'] = bool(report['dry_run'])
+        return reports
+
+    def report(self, scene_id):
+        """Full report of one scene, or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT report FROM scene_reports WHERE scene_id = ?', (scene_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+event_journal = EventJournal(JOURNAL_FILE)
+event_journal.start()
+
+status_messages = SequenceBuffer(STATUS_MESSAGE_BUFFER_SIZE)  # Live tail of the journal's status lines
+popup_notifications = SequenceBuffer(NOTIFICATION_BUFFER_SIZE)
+audio_notifications = SequenceBuffer(NOTIFICATION_BUFFER_SIZE)
+
+class StatusFeedHandler(logging.Handler):
+    """Feeds 'pilock.status' records carrying status_text into the dashboard status log.
+
+    Runs synchronously on the caller's thread (a queued journal write and an in-memory
+    append) so the dashboard sees a message as soon as add_status_message returns. Lines
+    are numbered by the journal, so older ones can be paged in from /journal.
+    """
+
+    def emit(self, record):
+        text = getattr(record, 'status_text', None)
+        if text is None:
+            return
+        # Handler.handle() serializes emit(), so IDs reach the buffer in increasing order
+        message_id = event_journal.record('status', text)
+        status_messages.append(text, seq=message_id)
+        bump_dashboard_version()
+        event_broadcaster.publish('log', {'id': message_id, 'text': text})
+
+status_feed_handler = StatusFeedHandler()
+status_feed_handler.addFilter(log_redactor)
+status_log.addHandler(status_feed_handler)
 
 def add_status_message(message):
+    """Log a status line; the dashboard status log is the view of these records"""
     timestamp = datetime.now().strftime('%H:%M:%S')
-    status_messages.append(f"[{timestamp}] {message}")
-    print(f"STATUS: [{timestamp}] {message}")
+    status_log.info(f"STATUS: [{timestamp}] {message}", extra={'status_text': f"[{timestamp}] {message}"})
+
+def get_status_log(since=0):
+    """Status log lines newer than since, with the cursor and epoch a client needs to continue"""
+    entries, last_id, epoch = status_messages.after(since)
+    return {
+        'messages': [{'id': message_id, 'text': text} for message_id, text in entries],
+        'last_id': last_id,
+        'epoch': epoch
+    }
+
+def load_status_tail():
+    """Fill the dashboard status log with the newest journal lines (it survives restarts)"""
+    try:
+        events = event_journal.query(kind='status', limit=STATUS_MESSAGE_BUFFER_SIZE)
+    except sqlite3.Error as e:
+        journal_log.error(f"JOURNAL ERROR: Cannot read the status log - {e}")
+        return
+    for event in reversed(events):
+        status_messages.append(event['message'], seq=event['id'])
+
+load_status_tail()
+
+def clear_status_messages():
+    """Clear the dashboard status log (the journal keeps every line)"""
+    status_messages.clear()
+    bump_dashboard_version()
+    event_broadcaster.publish('log_tail', get_status_log())
 
 def trigger_popup_notification(device_type, device_number, action_details):
     """Add a popup notification to the queue"""
@@ -268,8 +1398,9 @@ def trigger_popup_notification(device_type, device_number, action_details):
             'action_details': action_details,
             'timestamp': datetime.now().isoformat()
         }
-        popup_notification_queue.append(notification)
-        print(f"POPUP: {device_type} {device_number} - {action_details}")
+        seq = popup_notifications.append(notification)
+        event_broadcaster.publish('popup', dict(notification, seq=seq))
+        notify_log.info(f"POPUP: {device_type} {device_number} - {action_details}")
 
 def trigger_audio_notification(message):
     """Add an audio notification to the queue"""
@@ -279,8 +1410,143 @@ def trigger_audio_notification(message):
             'message': message,
             'timestamp': datetime.now().isoformat()
         }
-        audio_notification_queue.append(notification)
-        print(f"AUDIO: {message}")
+        seq = audio_notifications.append(notification)
+        event_broadcaster.publish('audio', dict(notification, seq=seq))
+        notify_log.info(f"AUDIO: {message}")
+
+class SimulatorPiShockAPI(PiShockAPI):
+    """PiShockAPI that sends its requests to tools/device_simulator.py instead of do.pishock.com"""
+    base_url = ''
+
+    def request(self, endpoint, params):
+        params = {'Username': self.username, 'Apikey': self.api_key, **params}
+        response = requests.post(f"{self.base_url}/pishock/api/{endpoint}", json=params, timeout=HTTP_TIMEOUT)
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            raise pishock.HTTPError(e) from e
+        return response
+
+pishock_api_class = PiShockAPI  # Swapped for SimulatorPiShockAPI by use_device_simulator()
+
+def use_device_simulator(base_url):
+    """Send all SwitchBot and PiShock traffic to a local device simulator (real code paths, no cloud)"""
+    global pishock_api_class
+    base_url = base_url.rstrip('/')
+    switchbot.client.switchbot_host = f"{base_url}/v1.1"
+    SimulatorPiShockAPI.base_url = base_url
+    pishock_api_class = SimulatorPiShockAPI
+    api_log.info(f"API: Using device simulator at {base_url} for SwitchBot and PiShock")
+
+if os.environ.get('PILOCK_SIMULATOR_URL'):
+    use_device_simulator(os.environ['PILOCK_SIMULATOR_URL'])
+
+class SwitchBotQuota:
+    """Counts SwitchBot API requests against the daily quota (persisted across restarts).
+
+    The count lives in memory. It is written to the store every
+    SWITCHBOT_QUOTA_FLUSH_CALLS requests, at most SWITCHBOT_QUOTA_FLUSH_INTERVAL
+    seconds after a request (the store's write-behind), when the day rolls over
+    and at exit.
+    """
+
+    def __init__(self, store, daily_limit=SWITCHBOT_DAILY_QUOTA):
+        self.store = store
+        self.daily_limit = daily_limit
+        self._lock = threading.Lock()
+        self._date = None  # Day self._calls counts, loaded from the store on first use
+        self._calls = 0
+        self._unflushed = 0  # Requests counted since the last immediate flush
+        self._exhausted_date = None  # Day the exhausted warning was last shown
+
+    def _today(self):
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def _load_locked(self):
+        if self._date is None:
+            data = self.store.load()
+            self._date, self._calls = data.get('date', ''), data.get('calls', 0)
+
+    def used(self):
+        with self._lock:
+            self._load_locked()
+            return self._calls if self._date == self._today() else 0
+
+    def remaining(self):
+        return max(0, self.daily_limit - self.used())
+
+    def record(self, calls=1):
+        """Count requests made against today's quota"""
+        with self._lock:
+            self._load_locked()
+            today = self._today()
+            rolled_over = self._date != today
+            if rolled_over:
+                self._date, self._calls = today, 0
+            self._calls += calls
+            self._unflushed += calls
+            used = self._calls
+            self.store.save({'date': today, 'calls': used})
+            flush_now = rolled_over or self._unflushed >= SWITCHBOT_QUOTA_FLUSH_CALLS
+            if flush_now:
+                self._unflushed = 0
+            newly_exhausted = used >= self.daily_limit and self._exhausted_date != today
+            if newly_exhausted:
+                self._exhausted_date = today
+        if flush_now:
+            self.store.flush()
+        if newly_exhausted:
+            sensor_log.info(f"SWITCHBOT QUOTA: Daily limit of {self.daily_limit} requests reached")
+            add_status_message("SwitchBot daily API quota used up - sensor and killswitch reads will fail")
+
+    def plan_intervals(self, watched, seconds_left, reserved_calls=0):
+        """Poll interval per device so projected usage to the scene end stays within today's budget.
+
+        watched maps device ID -> (base interval, priority); lower priorities are funded first
+        and keep their base interval while the budget allows it.
+        """
+        budget = self.remaining() - SWITCHBOT_QUOTA_RESERVE - reserved_calls
+        seconds_left = max(seconds_left, 1)
+        intervals = {}
+        for priority in sorted({priority for _, priority in watched.values()}):
+            group = [device_id for device_id, (_, p) in watched.items() if p == priority]
+            needed = sum(seconds_left / watched[device_id][0] for device_id in group)
+            if needed <= budget:
+                stretch = 1
+            else:
+                stretch = needed / budget if budget > 0 else float('inf')
+            for device_id in group:
+                intervals[device_id] = min(watched[device_id][0] * stretch, SWITCHBOT_MAX_POLL_INTERVAL)
+                budget -= seconds_left / intervals[device_id]
+        return intervals
+
+    def stats(self):
+        used = self.used()
+        return {
+            'date': self._today(),
+            'daily_limit': self.daily_limit,
+            'used': used,
+            'remaining': max(0, self.daily_limit - used)
+        }
+
+switchbot_quota = SwitchBotQuota(switchbot_quota_store)
+
+def projected_switchbot_presses(plan, seconds_left):
+    """Expected SwitchBot press requests for the rest of the scene"""
+    return sum(seconds_left / max(device.interval.mean(), 1) for device in plan.switchbot)
+
+def is_plug_on(status):
+    """Whether a SwitchBot plug status reports power on"""
+    return status.get('power', 'off') == 'on'
+
+def is_contact_open(status):
+    """Whether a SwitchBot contact sensor status reports open.
+
+    The v1.1 API reports openState; the client library snake_cases keys and values
+    (open_state: open / close / time_out_not_close).
+    """
+    state = status.get('open_state', status.get('contactState', 'close'))
+    return state in ('open', 'time_out_not_close', 'timeOutNotClose')
 
 def check_killswitch_status(switchbot_api, plug_id):
     """Check if the killswitch plug is still on"""
@@ -289,36 +1555,65 @@ def check_killswitch_status(switchbot_api, plug_id):
 
     try:
         # Get device status from SwitchBot API
+        switchbot_quota.record(2)  # Device lookup + status
         device = switchbot_api.device(id=plug_id)
-        status = device.status()
+        with CallTimer('switchbot_status'):
+            status = device.status()
 
         # Check if plug is on (power: "on")
-        power_status = status.get('power', 'off')
-        print(f"KILLSWITCH: Plug {plug_id} status: {power_status}")
+        sensor_log.info(f"KILLSWITCH: Plug {plug_id} status: {status.get('power', 'off')}")
 
-        return power_status == 'on'
+        return is_plug_on(status)
     except Exception as e:
-        print(f"KILLSWITCH ERROR: Failed to check plug status - {e}")
+        sensor_log.error(f"KILLSWITCH ERROR: Failed to check plug status - {e}")
         return True  # On error, continue scene (fail-safe)
 
-def check_contact_sensor_status(switchbot_api, sensor_id):
-    """Check contact sensor status and return True if open (triggered)"""
-    if not switchbot_api or not sensor_id:
-        return False  # No sensor configured
-
-    try:
-        # Get device status from SwitchBot API
-        device = switchbot_api.device(id=sensor_id)
-        status = device.status()
-
-        # Check if sensor is open (contactState: "open")
-        contact_state = status.get('contactState', 'close')
-        print(f"CONTACT SENSOR: Sensor {sensor_id} status: {contact_state}")
+class HttpPool:
+    """Keep-alive requests.Session per host shared by webhooks, custom accessories and the killswitch API.
+
+    Reusing the session skips DNS, TCP and TLS setup on every call after the first,
+    and prewarm() opens those connections ahead of time.
+    """
+
+    def __init__(self, pool_maxsize=HTTP_POOL_MAXSIZE, timeout=HTTP_TIMEOUT):
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    @staticmethod
+    def host_key(url):
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+    def session_for(self, url):
+        key = self.host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[key] = session
+            return session
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session_for(url).request(method, url, **kwargs)
+
+    def prewarm(self, urls):
+        """Open a keep-alive connection to each distinct host (HEAD of the host root, never the action URL)"""
+        warmed = 0
+        for key in {self.host_key(url) for url in urls if url}:
+            try:
+                self.session_for(key).head(key + '/', timeout=self.timeout, allow_redirects=False)
+                warmed += 1
+            except requests.exceptions.RequestException as e:
+                api_log.info(f"HTTP: Pre-warm of {key} failed - {e}")
+        api_log.info(f"HTTP: Pre-warmed connections to {warmed} host(s)")
 
-        return contact_state == 'open'
-    except Exception as e:
-        print(f"CONTACT SENSOR ERROR: Failed to check sensor {sensor_id} status - {e}")
-        return False  # On error, assume closed
+http_pool = HttpPool()
 
 def call_killswitch_api(api_endpoint):
     """Call the optional API endpoint when scene is terminated by killswitch"""
@@ -326,27 +1621,29 @@ def call_killswitch_api(api_endpoint):
         return
 
     try:
-        print(f"KILLSWITCH: Calling API endpoint - {api_endpoint}")
+        sensor_log.info(f"KILLSWITCH: Calling API endpoint - {api_endpoint}")
         headers = {
             'User-Agent': 'PiLock/1.0 (KillSwitch)',
             'Content-Type': 'application/json'
         }
 
-        response = requests.post(api_endpoint, headers=headers, timeout=10, json={
+        response = http_pool.request('POST', api_endpoint, headers=headers, json={
             'event': 'killswitch_triggered',
             'timestamp': datetime.now().isoformat(),
             'reason': 'switchbot_plug_disconnected'
         })
 
         if response.status_code == 200:
-            print(f"KILLSWITCH API: Call successful")
+            sensor_log.info(f"KILLSWITCH API: Call successful")
             add_status_message("Killswitch API called successfully")
         else:
-            print(f"KILLSWITCH API: Call failed (HTTP {response.status_code})")
+            sensor_log.info(f"KILLSWITCH API: Call failed (HTTP {response.status_code})")
             add_status_message(f"Killswitch API failed (HTTP {response.status_code})")
+        return response.status_code == 200
     except Exception as e:
-        print(f"KILLSWITCH API ERROR: {e}")
+        sensor_log.error(f"KILLSWITCH API ERROR: {e}")
         add_status_message("Killswitch API call failed")
+        return False
 
 def parse_parameter(value, default_fixed=5, default_min=2, default_max=10):
     """Parse parameter string like '5' or '2-10' into type and values"""
@@ -372,114 +1669,1192 @@ def parse_repeat_parameter(value):
         return ''  # Empty means unlimited
     return value.strip()
 
-def get_parameter_value(scene_state, prefix, param_name, default_value):
-    """Get actual parameter value (fixed or random) for scene execution"""
-    param_type_key = f'{prefix}_{param_name}_type'
-    param_type = scene_state.get(param_type_key, 'fixed')
-    
-    if param_type == 'fixed':
-        return scene_state.get(f'{prefix}_{param_name}_fixed', default_value)
-    else:
-        min_val = scene_state.get(f'{prefix}_{param_name}_random_min', default_value)
-        max_val = scene_state.get(f'{prefix}_{param_name}_random_max', default_value)
-        return random.randint(min_val, max_val)
+class ParameterRange:
+    """Pre-parsed scene parameter: a fixed value or an inclusive random range"""
+    __slots__ = ('is_random', 'fixed', 'low', 'high')
 
-def monitor_contact_sensors():
-    """Background thread to monitor contact sensors independently of main scene loop"""
-    global scene_active, contact_sensor_states, contact_sensor_devices, monitoring_switchbot_api
-    global monitoring_pishock_shockers, monitoring_switchbot_devices
+    def __init__(self, is_random, fixed, low, high):
+        self.is_random = is_random
+        self.fixed = fixed
+        self.low = min(low, high)
+        self.high = max(low, high)
 
-    print("CONTACT SENSOR MONITOR: Background monitoring thread started")
+    @classmethod
+    def from_state(cls, scene_state, prefix, param_name, default_fixed, default_min, default_max):
+        """Build from the flat '<prefix>_<param>_type/_fixed/_random_min/_random_max' scene state keys"""
+        try:
+            return cls(
+                scene_state.get(f'{prefix}_{param_name}_type', 'fixed') != 'fixed',
+                int(scene_state.get(f'{prefix}_{param_name}_fixed', default_fixed)),
+                int(scene_state.get(f'{prefix}_{param_name}_random_min', default_min)),
+                int(scene_state.get(f'{prefix}_{param_name}_random_max', default_max))
+            )
+        except (TypeError, ValueError):
+            return cls(False, default_fixed, default_min, default_max)
+
+    @classmethod
+    def from_string(cls, value, default_fixed):
+        """Build from a '5' or '5-25' style string"""
+        param_type, fixed, low, high = parse_parameter(str(value), default_fixed, default_fixed, default_fixed)
+        return cls(param_type == 'random', fixed, low, high)
+
+    def sample(self, rng=random):
+        if self.is_random:
+            return rng.randint(self.low, self.high)
+        return self.fixed
+
+    def mean(self):
+        return (self.low + self.high) / 2 if self.is_random else self.fixed
+
+    def describe(self):
+        return f"{self.low}-{self.high}" if self.is_random else str(self.fixed)
+
+class DevicePlan:
+    """Compiled timing/parameter record for one scene device"""
+    __slots__ = ('kind', 'number', 'key', 'enabled', 'interval', 'intensity', 'duration')
+
+    def __init__(self, kind, number, enabled, interval, intensity=None, duration=None):
+        self.kind = kind
+        self.number = number
+        self.key = f'{kind}_{number}'
+        self.enabled = enabled
+        self.interval = interval
+        self.intensity = intensity
+        self.duration = duration
+
+class ModifierPlan:
+    """Compiled settings for one scene modifier"""
+    __slots__ = ('number', 'enabled', 'contact_sensor', 'extend_minutes', 'extend_text', 'target')
+
+    def __init__(self, number, enabled, contact_sensor, extend_minutes=None, extend_text='', target=None):
+        self.number = number
+        self.enabled = enabled
+        self.contact_sensor = contact_sensor
+        self.extend_minutes = extend_minutes
+        self.extend_text = extend_text
+        self.target = target
+
+class ScenePlan:
+    """Scene state compiled into per-device records for the scene loop and modifiers"""
+    __slots__ = ('devices', 'pishock', 'switchbot', 'custom', 'modifiers', 'modifiers_by_sensor')
+
+    def __init__(self, devices, modifiers):
+        self.devices = {device.key: device for device in devices}
+        # Only enabled devices are iterated by the scene loop
+        self.pishock = tuple(d for d in devices if d.kind == 'pishock' and d.enabled)
+        self.switchbot = tuple(d for d in devices if d.kind == 'switchbot' and d.enabled)
+        self.custom = tuple(d for d in devices if d.kind == 'custom' and d.enabled)
+        self.modifiers = {modifier.number: modifier for modifier in modifiers}
+        self.modifiers_by_sensor = {}
+        for modifier in modifiers:
+            if modifier.enabled and modifier.contact_sensor:
+                self.modifiers_by_sensor.setdefault(modifier.contact_sensor, []).append(modifier)
+
+class SceneStream:
+    """One named random stream of a scene; records every draw and, when replaying, returns recorded draws first"""
+
+    def __init__(self, seed, name, replay=()):
+        self._random = random.Random(f'{seed}/{name}')
+        self._replay = deque(replay)
+        self.draws = []
+
+    def randint(self, low, high):
+        value = self._random.randint(low, high)  # Drawn even when replaying so the stream stays aligned
+        if self._replay:
+            value = self._replay.popleft()
+        self.draws.append(value)
+        return value
+
+class SceneRandom:
+    """Seeded random streams for one scene run.
+
+    Each consumer draws from its own named stream ('duration', '<device>.interval',
+    '<device>.params', 'modifier_1'), so a device's draws don't depend on how the scene,
+    actuator and poller threads interleave. replay maps stream names to recorded draws;
+    those are returned first and the seed takes over once they run out.
+    """
+
+    def __init__(self, seed=None, replay=None):
+        self.seed = random.getrandbits(32) if seed is None else int(seed)
+        self._replay = replay or {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def stream(self, name):
+        with self._lock:
+            if name not in self._streams:
+                self._streams[name] = SceneStream(self.seed, name, self._replay.get(name, ()))
+            return self._streams[name]
+
+    def draws(self):
+        """Every value drawn so far, by stream name"""
+        with self._lock:
+            return {name: list(stream.draws) for name, stream in self._streams.items() if stream.draws}
+
+class SceneRecorder:
+    """Collects what a scene run needs to be replayed: seed, config, random draws and outside events.
+
+    Events (modifiers, killswitch, stop) are stored as seconds after the scheduler started,
+    so a replay injects them at the same point in the activation schedule.
+    """
+
+    def __init__(self, rng, scene_state, dry_run, replay_of=None):
+        self.rng = rng
+        self.scene_state = thaw_config(scene_state)
+        self.dry_run = dry_run
+        self.replay_of = replay_of
+        self.recorded_at = datetime.now()
+        self.id = f"{self.recorded_at.strftime('%Y%m%d-%H%M%S')}-{rng.seed}"  # Also the scene's journal ID
+        self.origin = None  # time.monotonic() when the scheduler started
+        self.events = []
+        self._lock = threading.Lock()
+
+    def event(self, event_type, **fields):
+        offset = 0.0 if self.origin is None else max(0.0, time.monotonic() - self.origin)
+        with self._lock:
+            self.events.append(dict(fields, type=event_type, at=round(offset, 3)))
+
+    def save(self, duration):
+        """Write the recording and prune the oldest ones; returns the recording ID"""
+        recording_id = self.id
+        with self._lock:
+            events = list(self.events)
+        recording = {
+            'id': recording_id,
+            'recorded_at': self.recorded_at.isoformat(),
+            'version': load_version(),
+            'seed': self.rng.seed,
+            'dry_run': self.dry_run,
+            'replay_of': self.replay_of,
+            'duration_seconds': duration,
+            'scene_state': self.scene_state,
+            'draws': self.rng.draws(),
+            'events': events
+        }
+        os.makedirs(SCENE_RECORDINGS_DIR, exist_ok=True)
+        atomic_write_text(os.path.join(SCENE_RECORDINGS_DIR, f'{recording_id}.json'), json.dumps(recording), fsync=False)
+        for old_id in list_scene_recordings()[SCENE_RECORDINGS_KEEP:]:
+            os.remove(os.path.join(SCENE_RECORDINGS_DIR, f'{old_id}.json'))
+        return recording_id
+
+def list_scene_recordings():
+    """Saved recording IDs, newest first"""
+    try:
+        names = os.listdir(SCENE_RECORDINGS_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted((name[:-len('.json')] for name in names if name.endswith('.json')), reverse=True)
+
+def load_scene_recording(recording_id):
+    """A saved recording, or None if the ID is unknown or invalid"""
+    if not re.fullmatch(r'[\w-]+', recording_id or ''):
+        return None
+    try:
+        with open(os.path.join(SCENE_RECORDINGS_DIR, f'{recording_id}.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    # Load scene state and settings
-    scene_state = load_scene_state()
-    settings = load_settings()
+def sample_scene_duration(scene_state, rng=random):
+    """Scene length in seconds: the fixed minutes, or uniform over the random minute range"""
+    if scene_state['scene_duration_type'] == 'fixed':
+        return scene_state['scene_duration_fixed'] * 60
+    return rng.randint(scene_state['scene_duration_random_min'] * 60, scene_state['scene_duration_random_max'] * 60)
 
-    while scene_active:
-        try:
-            # Reload scene state each iteration to get latest configuration
-            scene_state = load_scene_state()
-            settings = load_settings()
+def parse_target_number(value):
+    """Parse a modifier target device number, None if unset or invalid"""
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
 
-            # Check each configured contact sensor
-            for sensor_num, sensor_device in contact_sensor_devices.items():
-                try:
-                    sensor_id = settings.get('contact_sensors', {}).get(f'sensor_{sensor_num}_id', '')
-                    current_state = check_contact_sensor_status(monitoring_switchbot_api, sensor_id)
-                    previous_state = contact_sensor_states.get(sensor_num, False)
+def compile_scene_plan(scene_state):
+    """Compile the flat scene_state dict into a ScenePlan"""
+    devices = []
+    for i in range(1, 5):
+        prefix = f'pishock_{i}'
+        devices.append(DevicePlan(
+            'pishock', i, bool(scene_state.get(f'{prefix}_enabled', False)),
+            ParameterRange.from_state(scene_state, prefix, 'interval', 5, 2, 10),
+            intensity=ParameterRange.from_state(scene_state, prefix, 'intensity', 25, 25, 25),
+            duration=ParameterRange.from_state(scene_state, prefix, 'duration', 1, 1, 1)
+        ))
+    for i in range(1, 5):
+        prefix = f'switchbot_{i}'
+        devices.append(DevicePlan(
+            'switchbot', i, bool(scene_state.get(f'{prefix}_enabled', False)),
+            ParameterRange.from_state(scene_state, prefix, 'interval', 5, 2, 10),
+            duration=ParameterRange.from_state(scene_state, prefix, 'duration', 1, 1, 1)
+        ))
+    for i in range(1, 5):
+        prefix = f'custom_{i}'
+        devices.append(DevicePlan(
+            'custom', i, bool(scene_state.get(f'{prefix}_enabled', False)),
+            ParameterRange.from_state(scene_state, prefix, 'interval', 5, 2, 10)
+        ))
 
-                    # Detect state change from closed to open (trigger event)
-                    if not previous_state and current_state:
-                        print(f"CONTACT SENSOR {sensor_num}: State changed to OPEN - checking modifiers")
-                        add_status_message(f"Contact Sensor {sensor_num} opened")
-                        trigger_popup_notification('contact_sensor', sensor_num, "Sensor Opened")
+    modifiers = []
+    for i in range(1, 5):
+        prefix = f'modifier_{i}'
+        modifier = ModifierPlan(i, bool(scene_state.get(f'{prefix}_enabled', False)),
+                                parse_target_number(scene_state.get(f'{prefix}_contact_sensor', '')))
+        if i == 1:  # Extend Time
+            modifier.extend_text = str(scene_state.get(f'{prefix}_extend_minutes', '5'))
+            modifier.extend_minutes = ParameterRange.from_string(modifier.extend_text, 5)
+        elif i == 2:  # Haptic Trigger
+            modifier.target = parse_target_number(scene_state.get(f'{prefix}_target_haptic', ''))
+        elif i == 3:  # Bot Trigger
+            modifier.target = parse_target_number(scene_state.get(f'{prefix}_target_bot', ''))
+        elif i == 4:  # Custom Trigger
+            modifier.target = parse_target_number(scene_state.get(f'{prefix}_target_custom', ''))
+        modifiers.append(modifier)
 
-                        # Check all modifiers that use this sensor
-                        for modifier_i in range(1, 5):
-                            if (scene_state.get(f'modifier_{modifier_i}_enabled', False) and
-                                scene_state.get(f'modifier_{modifier_i}_contact_sensor', '') == str(sensor_num)):
+    return ScenePlan(devices, modifiers)
 
-                                print(f"MODIFIER {modifier_i}: Triggered by Contact Sensor {sensor_num}")
-                                # Pass device references from global variables
-                                execute_modifier_action(modifier_i, scene_state, settings,
-                                                       pishock_shockers=monitoring_pishock_shockers,
-                                                       switchbot_devices=monitoring_switchbot_devices)
+scene_plan_lock = threading.Lock()
+scene_plan_cache = (None, None)  # (scene state snapshot, compiled plan)
 
-                    # Update stored state
-                    contact_sensor_states[sensor_num] = current_state
+def load_scene_plan():
+    """Return the compiled plan for the current scene state, recompiling only when it changed"""
+    global scene_plan_cache
+    scene_state = load_scene_state()
+    with scene_plan_lock:
+        source, plan = scene_plan_cache
+        if source is not scene_state:
+            # Snapshots are replaced (never mutated) on save, so identity means "unchanged"
+            plan = compile_scene_plan(scene_state)
+            scene_plan_cache = (scene_state, plan)
+        return plan
+
+class SceneCancelled(Exception):
+    """Raised when a wait or device call is abandoned because the scene was stopped"""
+
+class SceneCancellation:
+    """Cancellation token for one scene run.
+
+    Every wait in the scene engine (delay phase, scheduler sleeps, PiShock pauses,
+    monitor polling) goes through this token, so a stop request interrupts all of
+    them at once. Blocking device calls check it before and after the call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._waiters = set()  # Events to set when the scene is cancelled
+        self._wakeup = threading.Event()
+        self.cancelled_at = None  # time.monotonic() of the stop request
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            self.cancelled_at = time.monotonic()
+            waiters = list(self._waiters)
+        for event in waiters:
+            event.set()
+        self._wakeup.set()
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def wait_event(self, event, timeout=None):
+        """Wait until event is set, the scene is cancelled or timeout elapses"""
+        with self._lock:
+            if self._cancelled:
+                return event.is_set()
+            self._waiters.add(event)
+        try:
+            return event.wait(timeout)
+        finally:
+            with self._lock:
+                self._waiters.discard(event)
+
+    def sleep(self, seconds):
+        """Interruptible sleep; returns False if the scene was cancelled"""
+        self.wait_event(threading.Event(), max(0.0, seconds))
+        return not self._cancelled
+
+    def wake(self):
+        """Wake the scene thread so it re-evaluates end time and enabled devices now"""
+        self._wakeup.set()
+
+    def wait_for_wakeup(self, timeout):
+        """Scheduler sleep: returns on timeout, wake() or cancel()"""
+        self._wakeup.wait(max(0.0, timeout))
+        self._wakeup.clear()
+
+def run_cancellable(cancel, func, *args, **kwargs):
+    """Run a blocking device call on the calling device worker unless the scene was cancelled.
+
+    The call itself can't be interrupted, but if the scene is stopped while it is in
+    flight its result is discarded and SceneCancelled is raised, so the rest of the
+    activation (e.g. the shock after a vibrate) never runs. The scene thread never
+    waits on device workers, so a slow call only holds up its own device.
+    """
+    if cancel.is_cancelled():
+        raise SceneCancelled()
+    result = func(*args, **kwargs)
+    if cancel.is_cancelled():
+        raise SceneCancelled()
+    return result
+
+scene_cancel = SceneCancellation()  # Token of the current (or last) scene run
+
+def wake_scene():
+    """Wake the scene thread so it re-evaluates stop flags, end time and enabled devices now"""
+    scene_cancel.wake()
+
+class DeviceScheduler:
+    """Min-heap of per-device fire deadlines (time.monotonic() seconds).
+
+    Each device's next fire time is sampled once, after its previous activation,
+    so random intervals are uniform over the configured range. Intervals come from
+    the device's '<device>.interval' stream of the scene's SceneRandom.
+    """
+
+    def __init__(self, rng=None):
+        self.rng = rng or SceneRandom()
+        self._heap = []
+        self._next_fire = {}  # device key -> scheduled deadline (heap entries not matching are stale)
+
+    def schedule(self, device_key, fire_at):
+        self._next_fire[device_key] = fire_at
+        heapq.heappush(self._heap, (fire_at, device_key))
+
+    def schedule_next(self, device, after):
+        """Schedule a device one sampled interval (at least MIN_ACTIVATION_INTERVAL) after the given time"""
+        interval = device.interval.sample(self.rng.stream(f'{device.key}.interval'))
+        self.schedule(device.key, after + max(interval, MIN_ACTIVATION_INTERVAL))
+
+    def sync(self, plan, now, is_ready):
+        """Schedule newly enabled devices and drop devices that were disabled"""
+        ready = set()
+        for device in plan.pishock + plan.switchbot + plan.custom:
+            if not is_ready(device):
+                continue
+            ready.add(device.key)
+            if device.key not in self._next_fire:
+                self.schedule_next(device, now)
+        for device_key in list(self._next_fire):
+            if device_key not in ready:
+                del self._next_fire[device_key]
+
+    def _drop_stale(self):
+        while self._heap and self._next_fire.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_deadline(self):
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove and return (planned time, device key) for every device due at or before now"""
+        due = []
+        self._drop_stale()
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, device_key = heapq.heappop(self._heap)
+            del self._next_fire[device_key]
+            due.append((fire_at, device_key))
+            self._drop_stale()
+        return due
+
+class ActuatorPool:
+    """One worker thread and queue per device, so slow device I/O never blocks the scene loop.
+
+    Activations for the same device run in submission order. If a device is still
+    busy and already has ACTUATOR_MAX_PENDING activations queued, further firings are
+    collapsed (dropped) instead of piling up behind it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._threads = {}
+        self._closed = False
+        self.collapsed = {}
+
+    def submit(self, device_key, func, *args):
+        """Queue func(*args) on the device's worker; returns False if the firing was collapsed"""
+        with self._lock:
+            if self._closed:
+                return False
+            work_queue = self._queues.get(device_key)
+            if work_queue is None:
+                work_queue = self._queues[device_key] = queue.Queue()
+                thread = threading.Thread(target=profiled('actuator', self._run), args=(device_key, work_queue),
+                                          name=f'actuator-{device_key}', daemon=True)
+                self._threads[device_key] = thread
+                thread.start()
+            if work_queue.qsize() >= ACTUATOR_MAX_PENDING:
+                self.collapsed[device_key] = self.collapsed.get(device_key, 0) + 1
+                scene_log.info(f"ACTUATOR: {device_key} still busy - collapsing activation")
+                return False
+            work_queue.put((func, args))
+            return True
 
-                except Exception as e:
-                    print(f"CONTACT SENSOR ERROR: Failed to check sensor {sensor_num} - {e}")
+    def _run(self, device_key, work_queue):
+        while True:
+            item = work_queue.get()
+            if item is None or self._closed:
+                break
+            func, args = item
+            try:
+                func(*args)
+            except Exception as e:
+                scene_log.error(f"ACTUATOR ERROR: {device_key} activation failed - {e}")
 
-            # Check every 0.5 seconds for responsive monitoring
-            time.sleep(0.5)
+    def shutdown(self):
+        """Discard queued activations and stop the workers (in-flight calls finish in the background)"""
+        with self._lock:
+            self._closed = True
+            for work_queue in self._queues.values():
+                try:
+                    while True:
+                        work_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                work_queue.put(None)
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))]
+
+class ActivationRecord:
+    """Planned, dispatched, started and finished times (time.monotonic()) of one activation"""
+    __slots__ = ('device_key', 'planned', 'dispatched', 'started', 'finished', 'outcome', 'params')
+
+    def __init__(self, device_key, planned, dispatched):
+        self.device_key = device_key
+        self.planned = planned
+        self.dispatched = dispatched
+        self.started = None
+        self.finished = None
+        self.outcome = 'pending'
+        self.params = None  # Drawn parameters, e.g. {'intensity': 40, 'duration': 1}
+
+    def finish(self, outcome, at=None):
+        self.finished = time.monotonic() if at is None else at
+        self.outcome = outcome
+
+class ActivationTimeline:
+    """Per-scene record of every scheduled activation, to measure how far execution drifts from the plan.
+
+    planned is the scheduler deadline, dispatched is when the scene loop handed it to the
+    device worker, started/finished bracket the device call. Firings dropped because the
+    device was still busy are 'collapsed'; ones that never got to run are 'missed'.
+    """
+
+    def __init__(self, origin, maxlen=ACTIVATION_TIMELINE_SIZE):
+        self.origin = origin  # Scene execution start; times are reported relative to it
+        self.records = deque(maxlen=maxlen)
+        self.summary = None
+
+    def add(self, device_key, planned, dispatched):
+        record = ActivationRecord(device_key, planned, dispatched)
+        self.records.append(record)
+        return record
+
+    def close(self):
+        """Mark activations that never started as missed and compute the end-of-scene summary"""
+        for record in list(self.records):
+            if record.outcome == 'pending':
+                # Calls abandoned by the stop still finish (and overwrite this) in the background
+                record.outcome = 'missed' if record.started is None else 'in_flight'
+        self.summary = self.summarize()
+        return self.summary
+
+    def _relative_ms(self, value):
+        return None if value is None else round((value - self.origin) * 1000)
+
+    def to_list(self):
+        return [{
+            'device': record.device_key,
+            'planned_ms': self._relative_ms(record.planned),
+            'dispatched_ms': self._relative_ms(record.dispatched),
+            'started_ms': self._relative_ms(record.started),
+            'finished_ms': self._relative_ms(record.finished),
+            'outcome': record.outcome,
+            'params': record.params
+        } for record in list(self.records)]
+
+    def summarize(self):
+        """Per device: outcome counts and lateness (start - planned) mean/p95/max in ms"""
+        by_device = {}
+        for record in list(self.records):
+            by_device.setdefault(record.device_key, []).append(record)
+
+        summary = {}
+        for device_key, records in sorted(by_device.items()):
+            lateness = [(record.started - record.planned) * 1000 for record in records if record.started is not None]
+            durations = [(record.finished - record.started) * 1000 for record in records
+                         if record.started is not None and record.finished is not None]
+            outcomes = {}
+            for record in records:
+                outcomes[record.outcome] = outcomes.get(record.outcome, 0) + 1
+            summary[device_key] = {
+                'planned': len(records),
+                'outcomes': outcomes,
+                'lateness_mean_ms': round(sum(lateness) / len(lateness)) if lateness else None,
+                'lateness_p95_ms': round(percentile(lateness, 95)) if lateness else None,
+                'lateness_max_ms': round(max(lateness)) if lateness else None,
+                'call_mean_ms': round(sum(durations) / len(durations)) if durations else None
+            }
+        return summary
+
+def latency_stats(seconds):
+    """count / p50 / p95 / p99 / max in ms of a list of durations in seconds"""
+    ms = [value * 1000 for value in seconds]
+    if not ms:
+        return {'count': 0}
+    return {'count': len(ms), 'p50_ms': round(percentile(ms, 50)), 'p95_ms': round(percentile(ms, 95)),
+            'p99_ms': round(percentile(ms, 99)), 'max_ms': round(max(ms))}
+
+class SceneReport:
+    """Measurements of one scene run, turned into its end-of-scene report by build().
+
+    CallTimer, the contact sensor path and the extend modifier feed it through the
+    scene_report global while the scene runs; build() adds the activation timeline,
+    lock release and API usage.
+    """
+
+    def __init__(self, recorder, initial_delay):
+        self.recorder = recorder
+        self.initial_delay = initial_delay
+        self.started_at = datetime.now()
+        self.switchbot_used_at_start = switchbot_quota.used()
+        self.killswitch_at = None  # time.monotonic() the killswitch tripped
+        self.extensions = []  # Minutes added by the extend modifier
+        self._lock = threading.Lock()
+        self._calls = {}  # call name -> [(seconds, outcome)]
+        self._sensor_latencies = {}  # source -> [seconds from detection until the modifiers ran]
+
+    def observe_call(self, call, outcome, seconds):
+        with self._lock:
+            self._calls.setdefault(call, []).append((seconds, outcome))
+
+    def observe_sensor(self, source, seconds):
+        with self._lock:
+            self._sensor_latencies.setdefault(source, []).append(seconds)
+
+    def build(self, timeline, duration, start_time, ended_at, end_reason, release, poller, stop_latency):
+        with self._lock:
+            calls = {call: list(samples) for call, samples in self._calls.items()}
+            sensor_latencies = {source: list(samples) for source, samples in self._sensor_latencies.items()}
+        extensions = list(self.extensions)
+
+        devices = timeline.summarize()
+        for device_key, params in self._device_params(timeline).items():
+            devices[device_key]['params'] = {name: {'min': min(values), 'mean': round(sum(values) / len(values), 2),
+                                                    'max': max(values)} for name, values in params.items()}
+        failed_activations = {device_key: {outcome: count for outcome, count in stats['outcomes'].items()
+                                           if outcome not in ('ok', 'in_flight')}
+                              for device_key, stats in devices.items()}
+        lateness = [(record.started - record.planned) * 1000 for record in list(timeline.records)
+                    if record.started is not None]
+
+        return {
+            'scene_id': self.recorder.id,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'ended_at': datetime.now().isoformat(timespec='seconds'),
+            'version': load_version(),
+            'seed': self.recorder.rng.seed,
+            'dry_run': self.recorder.dry_run,
+            'replay_of': self.recorder.replay_of,
+            'end_reason': end_reason,
+            'duration': {
+                'initial_delay_seconds': self.initial_delay,
+                'planned_seconds': duration,
+                'extensions_minutes': extensions,
+                'planned_with_extensions_seconds': duration + sum(extensions) * 60,
+                'actual_seconds': round(ended_at - start_time, 1)
+            },
+            'activations': {
+                'total': sum(stats['outcomes'].get('ok', 0) for stats in devices.values()),
+                'lateness_p95_ms': round(percentile(lateness, 95)) if lateness else None,
+                'devices': devices
+            },
+            'failures': {
+                'activations': {device_key: outcomes for device_key, outcomes in failed_activations.items() if outcomes},
+                'calls': {call: sum(outcome == 'error' for _, outcome in samples)
+                          for call, samples in calls.items() if any(outcome == 'error' for _, outcome in samples)},
+                'unlock_retries': max(release.attempts - 1, 0)
+            },
+            'calls': {call: dict(latency_stats([seconds for seconds, outcome in samples if outcome != 'cancelled']),
+                                 errors=sum(outcome == 'error' for _, outcome in samples))
+                      for call, samples in sorted(calls.items())},
+            'api_usage': {
+                'switchbot': dict(poller.stats() if poller else {},
+                                  used=switchbot_quota.used() - self.switchbot_used_at_start,
+                                  remaining_today=switchbot_quota.remaining(),
+                                  daily_limit=switchbot_quota.daily_limit),
+                'pishock_calls': sum(len(calls.get(call, ())) for call in ('vibrate', 'shock'))
+            },
+            'sensors': {'modifier_latency': {source: latency_stats(samples)
+                                             for source, samples in sensor_latencies.items()}},
+            'killswitch': None if self.killswitch_at is None else {
+                'tripped_at_seconds': round(self.killswitch_at - start_time, 1),
+                'to_teardown_ms': round((ended_at - self.killswitch_at) * 1000)
+            },
+            'lock': {
+                'release_reason': release.reason,
+                'stop_to_teardown_ms': None if stop_latency is None else round(stop_latency * 1000),
+                'trigger_to_unlock_ms': None if release.unlock_latency is None else round(release.unlock_latency * 1000),
+                'attempts': release.attempts,
+                'success': release.success,
+                'killswitch_api_success': release.killswitch_api_success
+            },
+            'timeline': timeline.to_list()
+        }
 
-        except Exception as e:
-            print(f"CONTACT SENSOR MONITOR ERROR: {e}")
-            time.sleep(1)  # Sleep longer on error
+    @staticmethod
+    def _device_params(timeline):
+        """device key -> parameter name -> drawn values"""
+        params = {}
+        for record in list(timeline.records):
+            for name, value in (record.params or {}).items():
+                params.setdefault(record.device_key, {}).setdefault(name, []).append(value)
+        return params
+
+class VirtualClock:
+    """Stand-in for time.monotonic() in scene simulations; time only moves when advanced"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def monotonic(self):
+        return self.now
+
+    def advance_to(self, deadline):
+        self.now = max(self.now, deadline)
+
+class SimulatedActuators:
+    """Virtual-time model of ActuatorPool: one activation runs per device, ACTUATOR_MAX_PENDING
+    more may wait behind it, further firings are collapsed"""
+
+    def __init__(self, busy_seconds):
+        self.busy_seconds = busy_seconds  # device kind -> seconds one activation keeps the device busy
+        self._free_at = {}  # device key -> when the current activation finishes
+        self._queued = {}  # device key -> start times of activations waiting for the device
+
+    def submit(self, record, device, now):
+        """Start or queue the activation; returns False if it was collapsed"""
+        queued = [start for start in self._queued.get(device.key, ()) if start > now]
+        if len(queued) >= ACTUATOR_MAX_PENDING:
+            self._queued[device.key] = queued
+            return False
+        record.started = max(now, self._free_at.get(device.key, now))
+        record.finish('ok', at=record.started + self.busy_seconds[device.kind])
+        self._free_at[device.key] = record.finished
+        if record.started > now:
+            queued.append(record.started)
+        self._queued[device.key] = queued
+        return True
+
+def simulate_scene(scene_state, settings=None, events=(), rng=None, call_seconds=0.0):
+    """Replay a whole scene on a virtual clock, in milliseconds instead of the scene's real duration.
+
+    Uses the same plan compilation, DeviceScheduler and modifier rules as run_scene, but nothing
+    is called and no global scene state is touched. events is a list of {'at': seconds after the
+    initial delay, 'type': 'contact_open' | 'contact_close' | 'killswitch' | 'stop', 'sensor': n}.
+    Contact sensors start closed; with settings, only configured devices and sensors take part.
+    call_seconds is the assumed latency of each device/API call. rng is a SceneRandom; with the
+    seed of a real scene the simulation draws the same duration, intervals and extensions.
+    """
+    compute_start = time.perf_counter()
+    rng = rng or SceneRandom()
+    scene_state = thaw_config(scene_state)
+    plan = compile_scene_plan(scene_state)
+    duration = sample_scene_duration(scene_state, rng.stream('duration'))
+    clock = VirtualClock()
+    end_time = float(duration)
+    scheduler = DeviceScheduler(rng)
+    timeline = ActivationTimeline(clock.monotonic(), maxlen=SIMULATION_MAX_ACTIVATIONS)
+    actuators = SimulatedActuators({
+        'pishock': PISHOCK_NOTIFY_LEAD + call_seconds + PISHOCK_SHOCK_GAP + call_seconds,
+        'switchbot': call_seconds,
+        'custom': call_seconds
+    })
+
+    def device_ready(device):
+        if settings is None:
+            return True
+        if device.kind == 'pishock':
+            return bool(settings.get('pishock', {}).get('username')
+                        and settings.get('pishock', {}).get(f'sharecode_{device.number}'))
+        if device.kind == 'switchbot':
+            return bool(settings.get('switchbot', {}).get('token')
+                        and settings.get('switchbot', {}).get(f'device_{device.number}_id'))
+        return bool(settings.get('custom_accessories', {}).get(f'endpoint_{device.number}', ''))
+
+    def sensor_monitored(sensor_num):
+        return settings is None or bool(settings.get('contact_sensors', {}).get(f'sensor_{sensor_num}_id'))
+
+    contact_states = {}
+    executed = set()
+    modifier_log_entries = []
+    end_reason = 'completed'
+    pending_events = sorted(events, key=lambda event: event['at'])
+    event_index = 0
+    activations = 0
+
+    def run_modifier(modifier, now):
+        nonlocal plan, end_time
+        if modifier.number in executed:
+            return
+        entry = {'modifier': modifier.number, 'at_ms': round(now * 1000)}
+        if modifier.number == 1:
+            extend_minutes = modifier.extend_minutes.sample(rng.stream('modifier_1'))
+            end_time += extend_minutes * 60
+            entry['extended_minutes'] = extend_minutes
+        elif modifier.target:
+            kind = {2: 'pishock', 3: 'switchbot', 4: 'custom'}[modifier.number]
+            scene_state[f'{kind}_{modifier.target}_enabled'] = True
+            plan = compile_scene_plan(scene_state)
+            entry['enabled'] = f'{kind}_{modifier.target}'
+        else:
+            return
+        executed.add(modifier.number)
+        modifier_log_entries.append(entry)
+
+    while True:
+        now = clock.monotonic()
+        while event_index < len(pending_events) and pending_events[event_index]['at'] <= now < end_time:
+            event = pending_events[event_index]
+            event_index += 1
+            if event['type'] in ('killswitch', 'stop'):
+                end_reason = 'killswitch' if event['type'] == 'killswitch' else 'stopped'
+                end_time = now
+            elif event['type'] in ('contact_open', 'contact_close') and sensor_monitored(event.get('sensor')):
+                sensor_num = event['sensor']
+                is_open = event['type'] == 'contact_open'
+                was_open = contact_states.get(sensor_num, False)
+                contact_states[sensor_num] = is_open
+                if is_open and not was_open:
+                    for modifier in plan.modifiers_by_sensor.get(sensor_num, ()):
+                        run_modifier(modifier, now)
+        if now >= end_time:
+            break
+
+        scheduler.sync(plan, now, device_ready)
+        for fire_at, device_key in scheduler.pop_due(now):
+            device = plan.devices[device_key]
+            record = timeline.add(device_key, fire_at, now)
+            if not actuators.submit(record, device, now):
+                record.outcome = 'collapsed'
+            if device_ready(device):
+                scheduler.schedule_next(device, fire_at)
+            activations += 1
+        if activations >= SIMULATION_MAX_ACTIVATIONS:
+            end_reason = 'activation_limit'
+            end_time = now
+            break
+
+        wake_at = end_time
+        next_deadline = scheduler.next_deadline()
+        if next_deadline is not None:
+            wake_at = min(wake_at, next_deadline)
+        if event_index < len(pending_events):
+            wake_at = min(wake_at, max(pending_events[event_index]['at'], now))
+        clock.advance_to(wake_at)
+
+    # The scene end cancels what is still running and drops what never started
+    for record in timeline.records:
+        if record.started is None:
+            continue
+        if record.started >= end_time:
+            record.started = record.finished = None
+            record.outcome = 'missed'
+        elif record.finished > end_time:
+            record.finish('cancelled', at=end_time)
+
+    return {
+        'seed': rng.seed,
+        'duration_seconds': duration,
+        'initial_delay_seconds': scene_state.get('initial_delay', 0),
+        'ended_at_seconds': round(end_time, 3),
+        'end_reason': end_reason,
+        'modifiers': modifier_log_entries,
+        'summary': timeline.close(),
+        'records': timeline.to_list(),
+        'compute_ms': round((time.perf_counter() - compute_start) * 1000, 1)
+    }
 
-    print("CONTACT SENSOR MONITOR: Thread stopped")
+def sample_parameter_array(rng, param, shape):
+    """NumPy batch of ParameterRange.sample(): inclusive integer range or the fixed value"""
+    if param.is_random:
+        return rng.integers(param.low, param.high + 1, size=shape, dtype=np.int32)
+    return np.full(shape, param.fixed, dtype=np.int32)
+
+def distribution(values):
+    """mean / p5 / p50 / p95 / min / max of a 1-D sample array"""
+    if values.size == 0:
+        return None
+    p5, p50, p95 = np.percentile(values, [5, 50, 95])
+    return {'mean': round(float(values.mean()), 2), 'p5': round(float(p5), 2), 'p50': round(float(p50), 2),
+            'p95': round(float(p95), 2), 'min': round(float(values.min()), 2), 'max': round(float(values.max()), 2)}
+
+def histogram_distribution(counts):
+    """distribution() for integer values given as a bincount histogram"""
+    total = int(counts.sum())
+    if total == 0:
+        return None
+    values = np.arange(counts.size)
+    cumulative = np.cumsum(counts)
+    p5, p50, p95 = (int(np.searchsorted(cumulative, total * pct / 100)) for pct in (5, 50, 95))
+    present = np.nonzero(counts)[0]
+    return {'mean': round(float((values * counts).sum() / total), 2), 'p5': p5, 'p50': p50, 'p95': p95,
+            'min': int(present[0]), 'max': int(present[-1])}
+
+def sample_fire_times(rng, interval, ends):
+    """Fire times (seconds after the start) of one device in each of a batch of scenes.
+
+    Column k is the sum of k+1 sampled intervals. Columns are generated for the expected
+    number of activations and extended until every scene's last slot reaches its end.
+    """
+    rows = ends.shape[0]
+    slots = int(int(ends.max()) / max(interval.mean(), 1) * 1.1) + 8
+    times = np.cumsum(np.maximum(sample_parameter_array(rng, interval, (rows, slots)), MIN_ACTIVATION_INTERVAL), axis=1, dtype=np.int32)
+    while (times[:, -1] < ends[:, 0]).any():
+        extra = np.cumsum(np.maximum(sample_parameter_array(rng, interval, (rows, slots // 2 + 8)), MIN_ACTIVATION_INTERVAL),
+                          axis=1, dtype=np.int32)
+        times = np.concatenate([times, extra + times[:, -1:]], axis=1)
+    return times
+
+def preview_scene(scene_state, samples=MONTE_CARLO_SAMPLES, seed=None):
+    """Monte Carlo preview of a scene config: distributions over many sampled scenes, computed in NumPy batches.
+
+    Follows the scheduler's rules (first fire one interval after the start, each next one
+    interval after the planned time, nothing at or after the end). Contact-sensor modifiers
+    aren't triggered; extended_duration_minutes assumes the extend modifier fires.
+    """
+    compute_start = time.perf_counter()
+    plan = compile_scene_plan(scene_state)
+    rng = np.random.default_rng(seed)
+    warnings = []
 
-def execute_modifier_action(modifier_type, scene_state, settings, **kwargs):
-    """Execute modifier action based on type"""
+    if scene_state['scene_duration_type'] == 'fixed':
+        durations = np.full(samples, scene_state['scene_duration_fixed'] * 60, dtype=np.int32)
+    else:
+        low, high = sorted((scene_state['scene_duration_random_min'] * 60, scene_state['scene_duration_random_max'] * 60))
+        durations = rng.integers(low, high + 1, size=samples, dtype=np.int32)
+    width = int(durations.max()) + 1  # Key stride: every fire time is below the longest scene
+
+    devices = plan.pishock + plan.switchbot + plan.custom
+    for device in devices:
+        if (device.interval.low if device.interval.is_random else device.interval.fixed) < MIN_ACTIVATION_INTERVAL:
+            warnings.append(f"{device.key} interval can be below {MIN_ACTIVATION_INTERVAL} second(s); "
+                            f"activations are spaced at least {MIN_ACTIVATION_INTERVAL} second(s) apart")
+
+    never = np.iinfo(np.int32).max
+    counts = {device.key: np.zeros(samples, dtype=np.int32) for device in devices}
+    total_intensity = np.zeros(samples, dtype=np.int64)
+    peak_intensity = np.zeros(samples, dtype=np.int32)
+    shortest_gap = np.full(samples, never, dtype=np.int64)
+    gap_counts = np.zeros(width, dtype=np.int64)
+
+    batch = max(1, MONTE_CARLO_MAX_CELLS // width)
+    for start in range(0, samples, batch):
+        stop = min(start + batch, samples)
+        rows = stop - start
+        ends = durations[start:stop, None]
+        slots = []  # scene * width + second of every activation in the batch
+        for device in devices:
+            times = sample_fire_times(rng, device.interval, ends)
+            fired = times < ends
+            counts[device.key][start:stop] = fired.sum(axis=1)
+            if device.kind == 'pishock':
+                intensities = np.where(fired, sample_parameter_array(rng, device.intensity, fired.shape), 0)
+                total_intensity[start:stop] += intensities.sum(axis=1)
+                peak_intensity[start:stop] = np.maximum(peak_intensity[start:stop], intensities.max(axis=1))
+            # Fire times only increase, so each scene's activations are a prefix of its row
+            slots.append(np.repeat(np.arange(rows, dtype=np.int64) * width, counts[device.key][start:stop])
+                         + times[fired])
+        # Gaps between consecutive activations of any device: one sort of (scene, second) keys
+        # for the whole batch instead of a sort per scene
+        keys = np.sort(np.concatenate(slots)) if slots else np.zeros(0, dtype=np.int64)
+        if keys.size == 0:
+            continue
+        scene_rows = keys // width
+        gaps = np.diff(keys)
+        gaps[scene_rows[1:] != scene_rows[:-1]] = never  # Pairs that span two scenes
+        gap_counts += np.bincount(gaps[gaps != never], minlength=width)[:width]
+        # Per-scene minimum over each scene's run of gaps
+        firsts = np.flatnonzero(np.r_[True, scene_rows[1:] != scene_rows[:-1]])
+        batch_shortest = np.full(rows, never, dtype=np.int64)
+        batch_shortest[scene_rows[firsts]] = np.minimum.reduceat(np.append(gaps, never), firsts)
+        shortest_gap[start:stop] = batch_shortest
+
+    result = {
+        'samples': samples,
+        'duration_minutes': distribution(durations / 60),
+        'devices': {device.key: distribution(counts[device.key]) for device in devices},
+        'total_activations': distribution(sum(counts.values())) if devices else None,
+        'gap_seconds': histogram_distribution(gap_counts),
+        'shortest_gap_seconds': distribution(shortest_gap[shortest_gap != never]),
+        'warnings': warnings
+    }
+    if plan.pishock:
+        result['total_intensity'] = distribution(total_intensity)
+        result['peak_intensity'] = distribution(peak_intensity)
+    extend = plan.modifiers[1]
+    if extend.enabled:
+        extra = sample_parameter_array(rng, extend.extend_minutes, samples)
+        result['extended_duration_minutes'] = distribution(durations / 60 + extra)
+    result['compute_ms'] = round((time.perf_counter() - compute_start) * 1000, 1)
+    return result
+
+class SwitchBotStatusPoller:
+    """Owns every SwitchBot status read during a scene.
+
+    Watched devices are polled on their own interval and due devices are fetched
+    in parallel. Concurrent reads of the same device share one request, results
+    are cached for SWITCHBOT_STATUS_TTL seconds, and status changes are published
+    to subscribers (contact sensor modifiers, killswitch watcher). Poll intervals
+    are stretched when the projected usage would exceed the daily quota.
+    """
+
+    def __init__(self, switchbot_api, cancel, quota=None):
+        self.api = switchbot_api
+        self.cancel = cancel
+        self.quota = quota or switchbot_quota
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()  # Subscribers see one change at a time
+        self._devices_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=SWITCHBOT_MAX_PARALLEL,
+                                            thread_name_prefix='switchbot-status',
+                                            initializer=profiler.track, initargs=('poller',))
+        self._devices = {}
+        self._cache = {}  # device ID -> (time.monotonic() fetched, status dict)
+        self._inflight = {}  # device ID -> Future of the running request
+        self._base_intervals = {}  # device ID -> (requested interval, priority)
+        self._intervals = {}  # device ID -> poll interval in use (seconds)
+        self._next_retune = 0.0
+        self._next_poll = {}  # device ID -> time.monotonic() of next poll
+        self._subscribers = {}  # device ID -> [callback(device_id, status, previous_status)]
+        self._wakeup = threading.Event()
+        self.calls = 0
+        self.errors = 0
+        self.deduplicated = 0
+
+    def watch(self, device_id, interval, priority=1):
+        """Poll a device every interval seconds (first poll as soon as possible).
+
+        Lower priority numbers keep their interval longest when the quota runs short.
+        """
+        with self._lock:
+            self._base_intervals[device_id] = (interval, priority)
+            self._intervals[device_id] = interval
+            self._next_poll.setdefault(device_id, time.monotonic())
+            self._next_retune = 0.0
+        self._wakeup.set()
+
+    def device(self, device_id):
+        """SwitchBot device handle; a single device list request resolves every ID"""
+        with self._devices_lock:
+            if device_id not in self._devices:
+                self.quota.record()
+                for listed in self.api.devices():
+                    self._devices.setdefault(listed.id, listed)
+            if device_id not in self._devices:
+                raise ValueError(f"Unknown device {device_id}")
+            return self._devices[device_id]
+
+    def retune(self, seconds_left, reserved_calls=0):
+        """Fit the poll intervals to the quota left for the rest of the scene"""
+        with self._lock:
+            watched = dict(self._base_intervals)
+        intervals = self.quota.plan_intervals(watched, seconds_left, reserved_calls)
+        changed = []
+        with self._lock:
+            for device_id, interval in intervals.items():
+                previous = self._intervals.get(device_id)
+                if interval == previous:
+                    continue
+                changed.append((device_id, interval))
+                self._intervals[device_id] = interval
+                if interval < previous:
+                    self._next_poll[device_id] = min(self._next_poll[device_id], time.monotonic() + interval)
+        for device_id, interval in changed:
+            sensor_log.info(f"SWITCHBOT QUOTA: Polling {device_id} every {interval:.1f}s")
+
+    def intervals(self):
+        with self._lock:
+            return dict(self._intervals)
+
+    def subscribe(self, device_id, callback):
+        with self._lock:
+            self._subscribers.setdefault(device_id, []).append(callback)
+
+    def _fetch(self, device_id):
+        try:
+            device = self.device(device_id)
+            self.quota.record()
+            with CallTimer('switchbot_status'):
+                status = device.status()
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+                self._inflight.pop(device_id, None)
+            sensor_log.error(f"SWITCHBOT STATUS ERROR: Failed to read {device_id} - {e}")
+            raise
+
+        with self._lock:
+            self.calls += 1
+            previous = self._cache.get(device_id)
+            self._cache[device_id] = (time.monotonic(), status)
+            self._inflight.pop(device_id, None)
+            callbacks = list(self._subscribers.get(device_id, ()))
+
+        previous_status = previous[1] if previous else None
+        if status != previous_status and callbacks:
+            with self._publish_lock:
+                for callback in callbacks:
+                    try:
+                        callback(device_id, status, previous_status)
+                    except Exception as e:
+                        sensor_log.error(f"SWITCHBOT STATUS ERROR: Subscriber for {device_id} failed - {e}")
+        return status
+
+    def fetch_async(self, device_id):
+        """Start a status request, or join the one already in flight for this device"""
+        with self._lock:
+            future = self._inflight.get(device_id)
+            if future is not None:
+                self.deduplicated += 1
+                return future
+            future = self._inflight[device_id] = self._executor.submit(self._fetch, device_id)
+            return future
+
+    def get_status(self, device_id, max_age=SWITCHBOT_STATUS_TTL):
+        """Cached status if fresh enough, otherwise wait for a (shared) request; raises on API error"""
+        with self._lock:
+            cached = self._cache.get(device_id)
+        if cached and time.monotonic() - cached[0] <= max_age:
+            return cached[1]
+        future = self.fetch_async(device_id)
+        done = threading.Event()
+        future.add_done_callback(lambda _: done.set())
+        if not self.cancel.wait_event(done):
+            raise SceneCancelled()
+        return future.result()
+
+    def cached_statuses(self):
+        """Latest known status and its age for every device read this scene"""
+        now = time.monotonic()
+        with self._lock:
+            return {device_id: {'status': status, 'age_seconds': round(now - fetched_at, 1)}
+                    for device_id, (fetched_at, status) in self._cache.items()}
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'errors': self.errors, 'deduplicated': self.deduplicated}
+
+    def start(self):
+        threading.Thread(target=profiled('poller', self._run), name='switchbot-poller', daemon=True).start()
+
+    def _run(self):
+        sensor_log.info("SWITCHBOT POLLER: Started")
+        while not self.cancel.is_cancelled():
+            now = time.monotonic()
+            if now >= self._next_retune:
+                self._next_retune = now + SWITCHBOT_QUOTA_RETUNE_INTERVAL
+                seconds_left = (scene_end_time - now) if scene_end_time else SWITCHBOT_QUOTA_RETUNE_INTERVAL
+                self.retune(seconds_left, projected_switchbot_presses(load_scene_plan(), seconds_left))
+            with self._lock:
+                due = [device_id for device_id, next_at in self._next_poll.items() if next_at <= now]
+                for device_id in due:
+                    self._next_poll[device_id] = now + self._intervals[device_id]
+                fresh = {device_id for device_id in due
+                         if device_id in self._cache and now - self._cache[device_id][0] <= SWITCHBOT_STATUS_TTL}
+                next_at = min(self._next_poll.values(), default=now + 1)
+
+            for device_id in due:
+                if device_id not in fresh:
+                    self.fetch_async(device_id)
+
+            self.cancel.wait_event(self._wakeup, max(0.0, next_at - time.monotonic()))
+            self._wakeup.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        sensor_log.info("SWITCHBOT POLLER: Stopped")
+
+def process_contact_sensor_state(sensor_num, is_open, source='poll', detected_at=None):
+    """Open-edge detection for a contact sensor: runs its modifiers when it goes from closed to open"""
+    detected_at = detected_at or time.monotonic()
+    with contact_sensor_lock:
+        if sensor_num not in contact_sensor_devices or not scene_active or scene_cancel.is_cancelled():
+            return
+        previous_state = contact_sensor_states.get(sensor_num, False)
+        contact_sensor_states[sensor_num] = is_open
+        if is_open != previous_state:
+            event_journal.record('sensor', f"Contact Sensor {sensor_num} {'opened' if is_open else 'closed'}",
+                                 f'contact_sensor_{sensor_num}', {'open': is_open, 'source': source})
+
+        # Detect state change from closed to open (trigger event)
+        if previous_state or not is_open:
+            return
+
+        sensor_log.info(f"CONTACT SENSOR {sensor_num}: State changed to OPEN - checking modifiers")
+        add_status_message(f"Contact Sensor {sensor_num} opened")
+        trigger_popup_notification('contact_sensor', sensor_num, "Sensor Opened")
+
+        # Check all modifiers that use this sensor
+        plan = load_scene_plan()
+        settings = load_settings()
+        for modifier in plan.modifiers_by_sensor.get(sensor_num, ()):
+            modifier_log.info(f"MODIFIER {modifier.number}: Triggered by Contact Sensor {sensor_num}")
+            # Pass device references from global variables
+            execute_modifier_action(modifier.number, plan, settings,
+                                   pishock_shockers=monitoring_pishock_shockers,
+                                   switchbot_devices=monitoring_switchbot_devices)
+        contact_sensor_modifier_seconds.observe(time.monotonic() - detected_at, source)
+        report = scene_report
+        if report is not None:
+            report.observe_sensor(source, time.monotonic() - detected_at)
+
+def execute_modifier_action(modifier_type, plan, settings, **kwargs):
+    """Execute modifier action based on type, using the compiled scene plan"""
     global executed_modifiers, scene_end_time, monitoring_pishock_shockers, monitoring_pishock_api
     global monitoring_switchbot_devices, monitoring_switchbot_api, device_counts
 
     # Check if this modifier has already been executed
     if modifier_type in executed_modifiers:
-        print(f"MODIFIER {modifier_type}: Already executed, ignoring trigger")
+        modifier_log.info(f"MODIFIER {modifier_type}: Already executed, ignoring trigger")
         add_status_message(f"Modifier {modifier_type} already executed - ignoring repeated trigger")
         return
 
-    if modifier_type == 1:  # Extend Scene Time
-        extend_value = scene_state.get('modifier_1_extend_minutes', '5')
+    modifier = plan.modifiers[modifier_type]
+    if scene_recorder:
+        scene_recorder.event('modifier', modifier=modifier_type)
+    event_journal.record('modifier', f"Modifier {modifier_type} triggered", f'modifier_{modifier_type}')
 
-        # Parse extend value (could be "5" or "5-25")
-        if '-' in str(extend_value):
-            min_val, max_val = map(int, str(extend_value).split('-'))
-            extend_minutes = random.randint(min_val, max_val)
-        else:
-            extend_minutes = int(extend_value)
-
-        extend_seconds = extend_minutes * 60
+    if modifier_type == 1:  # Extend Scene Time
+        # Extend value was pre-parsed from "5" or "5-25"
+        extend_value = modifier.extend_text
 
         # Update global scene end time
         if scene_end_time:
-            scene_end_time = scene_end_time + timedelta(seconds=extend_seconds)
+            extend_minutes = modifier.extend_minutes.sample(scene_random.stream('modifier_1'))
+            extend_seconds = extend_minutes * 60
+            scene_end_time = scene_end_time + extend_seconds
+            if scene_report:
+                scene_report.extensions.append(extend_minutes)
+            publish_scene_status()
             add_status_message(f"Scene extended by {extend_minutes} minutes (from range: {extend_value})")
             trigger_popup_notification('modifier', 1, f"Scene Extended | +{extend_minutes} minutes")
             trigger_audio_notification(f"Scene extended by {extend_minutes} minutes")
-            print(f"MODIFIER 1: Scene extended by {extend_minutes} minutes (from range: {extend_value})")
+            modifier_log.info(f"MODIFIER 1: Scene extended by {extend_minutes} minutes (from range: {extend_value})")
             executed_modifiers.add(modifier_type)
 
     elif modifier_type == 2:  # Enable Haptic Module
-        target_haptic = scene_state.get('modifier_2_target_haptic', '')
-        if target_haptic:
-            haptic_num = int(target_haptic)
+        haptic_num = modifier.target
+        if haptic_num:
 
             # Enable the haptic module in scene state dynamically
-            scene_state[f'pishock_{haptic_num}_enabled'] = True
-            save_scene_state(scene_state)  # Persist to file for dashboard updates
+            update_scene_state({f'pishock_{haptic_num}_enabled': True})  # Persist to file for dashboard updates
 
             # Initialize device if not already active
             if haptic_num not in monitoring_pishock_shockers and monitoring_pishock_api:
@@ -488,50 +2863,46 @@ def execute_modifier_action(modifier_type, scene_state, settings, **kwargs):
                     try:
                         monitoring_pishock_shockers[haptic_num] = monitoring_pishock_api.shocker(sharecode)
                         device_counts[f'pishock_{haptic_num}'] = 0  # Initialize counter
-                        print(f"MODIFIER 2: Initialized Haptic Module {haptic_num} (Sharecode: {sharecode})")
+                        modifier_log.info(f"MODIFIER 2: Initialized Haptic Module {haptic_num} (Sharecode: {sharecode})")
                     except Exception as e:
-                        print(f"MODIFIER 2 ERROR: Failed to initialize Haptic Module {haptic_num} - {e}")
+                        modifier_log.error(f"MODIFIER 2 ERROR: Failed to initialize Haptic Module {haptic_num} - {e}")
 
             add_status_message(f"Haptic Module {haptic_num} enabled by modifier")
             trigger_popup_notification('modifier', 2, f"Haptic {haptic_num} Enabled")
             trigger_audio_notification(f"Haptic {haptic_num} enabled")
-            print(f"MODIFIER 2: Enabled Haptic Module {haptic_num}")
+            modifier_log.info(f"MODIFIER 2: Enabled Haptic Module {haptic_num}")
             executed_modifiers.add(modifier_type)
 
     elif modifier_type == 3:  # Enable Bot
-        target_bot = scene_state.get('modifier_3_target_bot', '')
-        if target_bot:
-            bot_num = int(target_bot)
+        bot_num = modifier.target
+        if bot_num:
 
             # Enable the switchbot in scene state dynamically
-            scene_state[f'switchbot_{bot_num}_enabled'] = True
-            save_scene_state(scene_state)  # Persist to file for dashboard updates
+            update_scene_state({f'switchbot_{bot_num}_enabled': True})  # Persist to file for dashboard updates
 
             # Initialize device if not already active
-            if bot_num not in monitoring_switchbot_devices and monitoring_switchbot_api:
+            if bot_num not in monitoring_switchbot_devices and switchbot_poller:
                 device_id = settings.get('switchbot', {}).get(f'device_{bot_num}_id', '')
                 if device_id:
                     try:
-                        monitoring_switchbot_devices[bot_num] = monitoring_switchbot_api.device(id=device_id)
+                        monitoring_switchbot_devices[bot_num] = switchbot_poller.device(device_id)
                         device_counts[f'switchbot_{bot_num}'] = 0  # Initialize counter
-                        print(f"MODIFIER 3: Initialized SwitchBot {bot_num} (ID: {device_id})")
+                        modifier_log.info(f"MODIFIER 3: Initialized SwitchBot {bot_num} (ID: {device_id})")
                     except Exception as e:
-                        print(f"MODIFIER 3 ERROR: Failed to initialize SwitchBot {bot_num} - {e}")
+                        modifier_log.error(f"MODIFIER 3 ERROR: Failed to initialize SwitchBot {bot_num} - {e}")
 
             add_status_message(f"SwitchBot {bot_num} enabled by modifier")
             trigger_popup_notification('modifier', 3, f"SwitchBot {bot_num} Enabled")
             trigger_audio_notification(f"SwitchBot {bot_num} enabled")
-            print(f"MODIFIER 3: Enabled SwitchBot {bot_num}")
+            modifier_log.info(f"MODIFIER 3: Enabled SwitchBot {bot_num}")
             executed_modifiers.add(modifier_type)
 
     elif modifier_type == 4:  # Enable Custom Accessory
-        target_custom = scene_state.get('modifier_4_target_custom', '')
-        if target_custom:
-            custom_num = int(target_custom)
+        custom_num = modifier.target
+        if custom_num:
 
             # Enable the custom accessory in scene state dynamically
-            scene_state[f'custom_{custom_num}_enabled'] = True
-            save_scene_state(scene_state)  # Persist to file for dashboard updates
+            update_scene_state({f'custom_{custom_num}_enabled': True})  # Persist to file for dashboard updates
 
             # Initialize counter if not already set
             if f'custom_{custom_num}' not in device_counts:
@@ -540,22 +2911,25 @@ def execute_modifier_action(modifier_type, scene_state, settings, **kwargs):
             add_status_message(f"Custom Accessory {custom_num} enabled by modifier")
             trigger_popup_notification('modifier', 4, f"Custom {custom_num} Enabled")
             trigger_audio_notification(f"Custom {custom_num} enabled")
-            print(f"MODIFIER 4: Enabled Custom Accessory {custom_num}")
+            modifier_log.info(f"MODIFIER 4: Enabled Custom Accessory {custom_num}")
             executed_modifiers.add(modifier_type)
 
+    # Let the scene thread pick up the new end time / enabled devices immediately
+    wake_scene()
+
 def call_custom_api(endpoint_url, method, payload, device_number, description, dry_run=False):
     """Call a custom API endpoint with specified method and payload"""
     if not endpoint_url:
-        print(f"CUSTOM API: No URL configured for {description}")
+        device_log.info(f"CUSTOM API: No URL configured for {description}")
         return False
 
     if dry_run:
-        print(f"CUSTOM API (DRY RUN): {description} - {method} {endpoint_url}")
+        device_log.info(f"CUSTOM API (DRY RUN): {description} - {method} {endpoint_url}")
         add_status_message(f"Custom {device_number} triggered (DRY RUN)")
         return True
 
     try:
-        print(f"CUSTOM API: Calling {description} - {method} {endpoint_url}")
+        device_log.info(f"CUSTOM API: Calling {description} - {method} {endpoint_url}")
 
         headers = {
             'User-Agent': 'PiLock/1.0 (CustomAccessory)',
@@ -567,27 +2941,24 @@ def call_custom_api(endpoint_url, method, payload, device_number, description, d
         try:
             json_payload = json.loads(payload) if payload and payload.strip() != '{}' else {}
         except json.JSONDecodeError:
-            print(f"CUSTOM API: Invalid JSON payload for {description}")
+            device_log.info(f"CUSTOM API: Invalid JSON payload for {description}")
             add_status_message(f"Custom {device_number} failed - invalid JSON")
             return False
 
-        # Make the API call based on method
-        response = None
-        if method.upper() == 'GET':
-            response = requests.get(endpoint_url, headers=headers, timeout=10, params=json_payload)
-        elif method.upper() == 'POST':
-            response = requests.post(endpoint_url, headers=headers, timeout=10, json=json_payload)
-        elif method.upper() == 'PUT':
-            response = requests.put(endpoint_url, headers=headers, timeout=10, json=json_payload)
-        elif method.upper() == 'PATCH':
-            response = requests.patch(endpoint_url, headers=headers, timeout=10, json=json_payload)
-        elif method.upper() == 'DELETE':
-            response = requests.delete(endpoint_url, headers=headers, timeout=10, json=json_payload)
-        else:
-            print(f"CUSTOM API: Unsupported method {method}")
+        if method.upper() not in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE'):
+            device_log.info(f"CUSTOM API: Unsupported method {method}")
             add_status_message(f"Custom {device_number} failed - unsupported method")
             return False
 
+        # Make the API call based on method
+        with CallTimer('call_custom_api') as timer:
+            if method.upper() == 'GET':
+                response = http_pool.request('GET', endpoint_url, headers=headers, params=json_payload)
+            else:
+                response = http_pool.request(method.upper(), endpoint_url, headers=headers, json=json_payload)
+            if response.status_code not in [200, 201, 202, 204]:
+                timer.outcome = 'error'
+
         if response.status_code in [200, 201, 202, 204]:
             add_status_message(f"Custom {device_number} API call successful")
             return True
@@ -596,22 +2967,22 @@ def call_custom_api(endpoint_url, method, payload, device_number, description, d
             return False
 
     except Exception as e:
-        print(f"CUSTOM API ERROR: {description} failed - {e}")
+        device_log.error(f"CUSTOM API ERROR: {description} failed - {e}")
         add_status_message(f"Custom {device_number} API call failed - connection error")
         return False
 
 def call_webhook(url, description, dry_run=False):
     if not url:
-        print(f"WEBHOOK: No URL configured for {description}")
+        device_log.info(f"WEBHOOK: No URL configured for {description}")
         return False
 
     if dry_run:
-        print(f"WEBHOOK (DRY RUN): {description} - {url}")
+        device_log.info(f"WEBHOOK (DRY RUN): {description} - {url}")
         add_status_message(f"{description} (DRY RUN)")
         return True
 
     try:
-        print(f"WEBHOOK: Calling {description} - {url}")
+        device_log.info(f"WEBHOOK: Calling {description} - {url}")
 
         # Simulate a real web browser request (simplified headers for eWeLink compatibility)
         headers = {
@@ -621,7 +2992,10 @@ def call_webhook(url, description, dry_run=False):
             'Connection': 'keep-alive',
         }
 
-        response = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
+        with CallTimer('call_webhook') as timer:
+            response = http_pool.request('GET', url, headers=headers, allow_redirects=True)
+            if response.status_code != 200:
+                timer.outcome = 'error'
         if response.status_code == 200:
             add_status_message(f"{description} successful")
             return True
@@ -629,10 +3003,123 @@ def call_webhook(url, description, dry_run=False):
             add_status_message(f"{description} failed (HTTP {response.status_code})")
             return False
     except Exception as e:
-        print(f"WEBHOOK ERROR: {description} failed - {e}")
+        device_log.error(f"WEBHOOK ERROR: {description} failed - {e}")
         add_status_message(f"{description} failed - connection error")
         return False
 
+class LockRelease:
+    """Fast-path lock release for one scene.
+
+    The first stop, killswitch or scene end trigger fires the disengage webhook
+    (with retries) and, for the killswitch (and its test), its API endpoint on their own threads
+    straight away, without waiting for the scene thread to unwind. The disengage
+    is held back until any in-flight engage request has finished, so the two can
+    never arrive out of order. It is skipped only when an engage webhook is
+    configured and the engage never started (stopped during the initial delay).
+    done is set once every call started by the trigger has finished.
+    """
+
+    def __init__(self, settings, dry_run=False):
+        self.disengage_webhook = settings.get('lock', {}).get('disengage_webhook', '')
+        self.engage_webhook = settings.get('lock', {}).get('engage_webhook', '')
+        self.killswitch_api_endpoint = settings.get('killswitch', {}).get('api_endpoint', '')
+        self.dry_run = dry_run
+        self._lock = threading.Lock()
+        self._engage_started = False
+        self._engage_done = threading.Event()
+        if not self.engage_webhook:
+            self._engage_done.set()  # Nothing to wait for before disengaging
+        self.done = threading.Event()
+        self._pending = 0  # Release calls still running
+        self.reason = None
+        self.triggered_at = None  # time.monotonic() of the trigger
+        self.unlock_latency = None
+        self.attempts = 0
+        self.success = None
+        self.killswitch_api_success = None  # Result of the killswitch API call, if one was made
+
+    def engage(self):
+        """Engage the lock unless a release was already triggered"""
+        with self._lock:
+            if self.triggered_at is not None:
+                return False
+            self._engage_started = True
+        try:
+            return call_webhook(self.engage_webhook, "Activate Lock: ", self.dry_run)
+        finally:
+            self._engage_done.set()
+
+    def trigger(self, reason):
+        """Start the release; only the first call per scene has any effect"""
+        with self._lock:
+            if self.triggered_at is not None:
+                return False
+            self.triggered_at = time.monotonic()
+            self.reason = reason
+            locked = self._engage_started or not self.engage_webhook
+
+        lock_log.info(f"LOCK: Release triggered ({reason})")
+        calls = []
+        if reason in ('killswitch', 'killswitch_test') and self.killswitch_api_endpoint:
+            calls.append((self._call_killswitch_api, (reason,)))
+        if locked and self.disengage_webhook:
+            calls.append((self._disengage, ()))
+        self._pending = len(calls)
+        if not calls:
+            self.done.set()
+        for target, args in calls:
+            threading.Thread(target=self._run_call, args=(target, args), daemon=True).start()
+        return True
+
+    def _run_call(self, target, args):
+        try:
+            target(*args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                finished = self._pending == 0
+            if finished:
+                self.done.set()
+
+    def _call_killswitch_api(self, reason):
+        if reason == 'killswitch_test':
+            self.killswitch_api_success = call_webhook(self.killswitch_api_endpoint, "Killswitch API (TEST)")
+        else:
+            self.killswitch_api_success = call_killswitch_api(self.killswitch_api_endpoint)
+        if not self.killswitch_api_success:
+            lock_log.error(f"LOCK: Killswitch API call failed ({reason})")
+
+    def _disengage(self):
+        global last_unlock
+        self._engage_done.wait()
+        if self.dry_run:
+            lock_log.info("LOCK: Disengaging lock via webhook (DRY RUN)")
+        else:
+            lock_log.info("LOCK: Disengaging lock via webhook")
+
+        for attempt in range(1, UNLOCK_RETRIES + 1):
+            self.attempts = attempt
+            self.success = call_webhook(self.disengage_webhook, "Lock disengaged", self.dry_run)
+            if self.success:
+                break
+            if attempt < UNLOCK_RETRIES:
+                lock_log.info(f"LOCK: Disengage attempt {attempt} failed - retrying")
+                time.sleep(UNLOCK_RETRY_DELAY * attempt)
+
+        self.unlock_latency = time.monotonic() - self.triggered_at
+        last_unlock = {
+            'reason': self.reason,
+            'success': self.success,
+            'attempts': self.attempts,
+            'latency_ms': round(self.unlock_latency * 1000)
+        }
+        lock_log.info(f"LOCK: Release {'succeeded' if self.success else 'FAILED'} after {self.attempts} attempt(s), "
+                      f"{self.unlock_latency * 1000:.0f} ms after {self.reason}")
+        if self.success:
+            trigger_popup_notification('lock', 'disengage', "Lock Disengaged" + (" (DRY RUN)" if self.dry_run else ""))
+        else:
+            add_status_message(f"Lock disengage FAILED after {self.attempts} attempts")
+
 @app.route('/')
 def dashboard():
     scene_state = load_scene_state()
@@ -653,7 +3140,7 @@ def settings():
 
 @app.route('/save_settings', methods=['POST'])
 def save_settings_route():
-    print("SETTINGS: Saving new settings configuration")
+    config_log.info("SETTINGS: Saving new settings configuration")
     settings = {
         'switchbot': {
             'token': request.form['switchbot_token'],
@@ -702,11 +3189,12 @@ def save_settings_route():
             'sensor_1_id': request.form['contact_sensor_1_id'],
             'sensor_2_id': request.form['contact_sensor_2_id'],
             'sensor_3_id': request.form['contact_sensor_3_id'],
-            'sensor_4_id': request.form['contact_sensor_4_id']
+            'sensor_4_id': request.form['contact_sensor_4_id'],
+            'webhook_key': request.form.get('contact_sensor_webhook_key', '').strip()
         }
     }
     save_settings(settings)
-    print("SETTINGS: Configuration saved successfully")
+    config_log.info("SETTINGS: Configuration saved successfully")
 
     # Check if this is an AJAX request
     is_ajax = (request.headers.get('X-Requested-With') == 'XMLHttpRequest' or
@@ -729,7 +3217,7 @@ def check_updates():
         
         if response.status_code == 200:
             remote_version = response.text.strip()
-            print(f"DEBUG: Local version: '{current_version}', Remote version: '{remote_version}'")
+            api_log.debug(f"DEBUG: Local version: '{current_version}', Remote version: '{remote_version}'")
             
             if remote_version != current_version:
                 message = f"New version available: {remote_version}"
@@ -769,7 +3257,7 @@ def update_app():
 
 @app.route('/save_scene_config', methods=['POST'])
 def save_scene_config():
-    print("SCENE CONFIG: Saving scene configuration")
+    config_log.info("SCENE CONFIG: Saving scene configuration")
     
     # Parse scene duration
     duration_str = request.form.get('scene_duration', '5')
@@ -892,7 +3380,7 @@ def save_scene_config():
             scene_state[f'{prefix}_target_custom'] = request.form.get(f'{prefix}_target_custom', '')
 
     save_scene_state(scene_state)
-    print("SCENE CONFIG: Configuration saved successfully")
+    config_log.info("SCENE CONFIG: Configuration saved successfully")
 
     # Check if request is AJAX/fetch by looking for JSON acceptance or specific header
     is_ajax = (request.headers.get('X-Requested-With') == 'XMLHttpRequest' or
@@ -908,58 +3396,165 @@ def save_scene_config():
 def start_scene():
     global scene_thread, scene_active
     if not scene_active:
-        print("SCENE: Starting new scene")
+        scene_log.info("SCENE: Starting new scene")
         add_status_message("Scene starting...")
-        scene_thread = threading.Thread(target=run_scene)
+        scene_thread = threading.Thread(target=profiled('scene', run_scene),
+                                        kwargs={'seed': request.values.get('seed', type=int)})
         scene_thread.daemon = True
         scene_thread.start()
     else:
-        print("SCENE: Scene already running, ignoring start request")
+        scene_log.info("SCENE: Scene already running, ignoring start request")
     return redirect(url_for('dashboard'))
 
 @app.route('/start_scene_dry_run', methods=['POST'])
 def start_scene_dry_run():
     global scene_thread, scene_active
     if not scene_active:
-        print("SCENE: Starting new scene (DRY RUN MODE)")
+        scene_log.info("SCENE: Starting new scene (DRY RUN MODE)")
         add_status_message("Scene starting... (DRY RUN MODE)")
-        scene_thread = threading.Thread(target=run_scene, args=(True,))
+        scene_thread = threading.Thread(target=profiled('scene', run_scene),
+                                        kwargs={'dry_run': True, 'seed': request.values.get('seed', type=int)})
         scene_thread.daemon = True
         scene_thread.start()
     else:
-        print("SCENE: Scene already running, ignoring start request")
+        scene_log.info("SCENE: Scene already running, ignoring start request")
     return redirect(url_for('dashboard'))
 
-@app.route('/stop_scene', methods=['POST'])
-def stop_scene():
+def request_scene_stop():
+    """Stop the running scene: unlock right away and cancel everything the scene is waiting on"""
     global scene_active, scene_end_time, scene_delay_end_time, scene_in_delay, scene_execution_start_time
     if scene_active:
-        print("SCENE: Stopping scene")
+        scene_log.info("SCENE: Stopping scene")
         add_status_message("Scene stopped by user")
+        if scene_recorder:
+            scene_recorder.event('stop')
+        if scene_lock_release:
+            scene_lock_release.trigger('stop')  # Unlock immediately, in parallel with teardown
         scene_active = False
         scene_end_time = None
         scene_delay_end_time = None
         scene_in_delay = False
         scene_execution_start_time = None
+        scene_cancel.cancel()
+        publish_scene_status()
     else:
-        print("SCENE: No scene running, ignoring stop request")
+        scene_log.info("SCENE: No scene running, ignoring stop request")
+
+@app.route('/replay_scene', methods=['POST'])
+def replay_scene():
+    """Re-execute a recorded scene (?recording=<id>, default the newest) as a dry run, or with
+    dry_run=false against the device simulator"""
+    global scene_thread
+    data = request.get_json(silent=True) or request.values
+    recording_id = data.get('recording') or next(iter(list_scene_recordings()), None)
+    recording = load_scene_recording(recording_id)
+    if recording is None:
+        return jsonify({'success': False, 'message': 'Recording not found'}), 404
+    dry_run = str(data.get('dry_run', True)).lower() not in ('0', 'false', 'no')
+    if not dry_run and pishock_api_class is not SimulatorPiShockAPI:
+        return jsonify({'success': False, 'message': 'Replays use real devices only with --simulator'}), 400
+    if scene_active:
+        return jsonify({'success': False, 'message': 'A scene is already running'}), 409
+    scene_log.info(f"SCENE: Replaying {recording_id}" + (" (DRY RUN MODE)" if dry_run else ""))
+    add_status_message(f"Replaying scene {recording_id}..." + (" (DRY RUN MODE)" if dry_run else ""))
+    scene_thread = threading.Thread(target=profiled('scene', run_scene),
+                                    kwargs={'dry_run': dry_run, 'replay': recording})
+    scene_thread.daemon = True
+    scene_thread.start()
+    return jsonify({'success': True, 'recording': recording_id, 'seed': recording['seed'], 'dry_run': dry_run})
+
+@app.route('/scene_recordings')
+def scene_recordings():
+    """Saved scene recordings, newest first"""
+    recordings = []
+    for recording_id in list_scene_recordings():
+        recording = load_scene_recording(recording_id)
+        if recording:
+            recordings.append({key: recording.get(key) for key in
+                               ('id', 'recorded_at', 'version', 'seed', 'dry_run', 'replay_of', 'duration_seconds')})
+    return jsonify(recordings)
+
+@app.route('/scene_recordings/<recording_id>')
+def scene_recording(recording_id):
+    """Download one recording as JSON"""
+    recording = load_scene_recording(recording_id)
+    if recording is None:
+        return jsonify({'success': False, 'message': 'Recording not found'}), 404
+    response = jsonify(recording)
+    response.headers['Content-Disposition'] = f'attachment; filename=scene-{recording_id}.json'
+    return response
+
+@app.route('/stop_scene', methods=['POST'])
+def stop_scene():
+    request_scene_stop()
     return redirect(url_for('dashboard'))
 
 @app.route('/status_messages')
 def status_messages_endpoint():
-    return jsonify(list(status_messages))
+    """Status log. ?since=<id> returns only newer lines (with ids and the next cursor) and
+    ?wait=<seconds> holds the request until one arrives; If-None-Match gets 304 when unchanged."""
+    since = request.args.get('since', type=int)
+    wait = min(request.args.get('wait', 0, type=float), LONG_POLL_MAX_WAIT)
+    if since is not None and wait > 0:
+        status_messages.wait_after(since, wait)
+    log = get_status_log(since or 0)
+
+    etag = f"{log['epoch']}.{log['last_id']}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif since is None:
+        response = jsonify([message['text'] for message in log['messages']])
+    else:
+        response = jsonify(log)
+    response.set_etag(etag)
+    return response
+
+@app.route('/journal')
+def journal():
+    """Event journal, newest first. Filters: ?scene=&device=&kind=, ?since=&until= (Unix time),
+    ?after=<id>; ?before=<next_before> fetches the next (older) page"""
+    limit = min(max(request.args.get('limit', JOURNAL_PAGE_SIZE, type=int), 1), JOURNAL_MAX_PAGE_SIZE)
+    try:
+        events = event_journal.query(request.args.get('scene'), request.args.get('device'), request.args.get('kind'),
+                                     request.args.get('before', type=int), request.args.get('after', type=int),
+                                     request.args.get('since', type=float), request.args.get('until', type=float),
+                                     limit)
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'message': f'Journal unavailable: {e}'}), 503
+    return jsonify({'events': events, 'next_before': events[-1]['id'] if len(events) == limit else None})
+
+@app.route('/scene_reports')
+def scene_reports():
+    """Headline numbers of the last ?limit= scenes (default 10), newest first"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), JOURNAL_MAX_PAGE_SIZE)
+    try:
+        return jsonify(event_journal.reports(limit))
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'message': f'Journal unavailable: {e}'}), 503
+
+@app.route('/scene_reports/<scene_id>')
+def scene_report_download(scene_id):
+    """Full report of one scene as a JSON download"""
+    try:
+        report = event_journal.report(scene_id)
+    except sqlite3.Error as e:
+        return jsonify({'success': False, 'message': f'Journal unavailable: {e}'}), 503
+    if report is None:
+        return jsonify({'success': False, 'message': 'Report not found'}), 404
+    response = jsonify(report)
+    response.headers['Content-Disposition'] = f'attachment; filename=scene-report-{scene_id}.json'
+    return response
 
 @app.route('/clear_status_log', methods=['POST'])
 def clear_status_log():
     """Clear the status message log"""
-    global status_messages
-    status_messages.clear()
-    print("STATUS: Status log cleared by user")
+    clear_status_messages()
+    status_log.info("STATUS: Status log cleared by user")
     return redirect(url_for('dashboard'))
 
 @app.route('/reset_config', methods=['POST'])
 def reset_config():
-    print("SCENE CONFIG: Resetting to default configuration")
+    config_log.info("SCENE CONFIG: Resetting to default configuration")
 
     # Load defaults from the default file
     default_file_path = 'data/scene_state_default.json'
@@ -968,17 +3563,16 @@ def reset_config():
             default_state = json.load(f)
 
         # Write the default state to the scene state file
-        with open(SCENE_STATE_FILE, 'w') as f:
-            json.dump(default_state, f, indent=2)
+        save_scene_state(default_state)
 
         add_status_message("Configuration reset to defaults")
-        print("SCENE CONFIG: Default values loaded from scene_state_default.json")
+        config_log.info("SCENE CONFIG: Default values loaded from scene_state_default.json")
     else:
         # Fallback to old method if default file doesn't exist
-        if os.path.exists(SCENE_STATE_FILE):
-            os.remove(SCENE_STATE_FILE)
+        scene_state_store.reset()
+        publish_device_states()
         add_status_message("Configuration reset to defaults")
-        print("SCENE CONFIG: Default file not found, using fallback method")
+        config_log.info("SCENE CONFIG: Default file not found, using fallback method")
 
     # Check if request is AJAX/fetch by looking for JSON acceptance or specific header
     is_ajax = (request.headers.get('X-Requested-With') == 'XMLHttpRequest' or
@@ -990,42 +3584,257 @@ def reset_config():
     else:
         return redirect(url_for('dashboard'))
 
+@app.route('/config_stats')
+def config_stats():
+    """Config cache counters (cache hits vs. disk reads/writes)"""
+    return jsonify({
+        'settings': settings_store.stats(),
+        'scene_state': scene_state_store.stats()
+    })
+
+@app.route('/scene_timing')
+def scene_timing():
+    """Latency of the last stop request and lock release"""
+    return jsonify({
+        'stop_latency_ms': round(last_stop_latency * 1000) if last_stop_latency is not None else None,
+        'last_unlock': last_unlock
+    })
+
+@app.route('/activation_timeline')
+def activation_timeline_endpoint():
+    """Planned vs. dispatched vs. finished times of every activation in the current (or last) scene"""
+    if not activation_timeline:
+        return jsonify({'records': [], 'summary': None})
+    return jsonify({
+        'records': activation_timeline.to_list(),
+        'summary': activation_timeline.summary or activation_timeline.summarize()
+    })
+
+@app.route('/scene_preview')
+def scene_preview():
+    """Monte Carlo distributions for the saved scene config (?samples=&seed=)"""
+    if np is None:
+        return jsonify({'success': False, 'message': 'Scene preview needs NumPy (pip install numpy)'}), 501
+    samples = min(max(request.args.get('samples', MONTE_CARLO_SAMPLES, type=int), 1), MONTE_CARLO_MAX_SAMPLES)
+    result = preview_scene(load_scene_state(), samples, request.args.get('seed', type=int))
+    result['success'] = True
+    return jsonify(result)
+
+SIMULATION_EVENT_TYPES = ('contact_open', 'contact_close', 'killswitch', 'stop')
+
+@app.route('/simulate_scene', methods=['POST'])
+def simulate_scene_endpoint():
+    """Replay the scene config on a virtual clock and return its activation timeline.
+
+    JSON body (all optional): scene_state (overrides on the saved config), events, seed,
+    call_seconds, use_settings (default true: only configured devices and sensors take part).
+    """
+    data = request.get_json(silent=True) or {}
+    events = data.get('events', [])
+    if not isinstance(events, list):
+        return jsonify({'success': False, 'message': 'events must be a list'}), 400
+    for event in events:
+        if (not isinstance(event, dict) or event.get('type') not in SIMULATION_EVENT_TYPES
+                or not isinstance(event.get('at'), (int, float))
+                or (event['type'].startswith('contact_') and event.get('sensor') not in (1, 2, 3, 4))):
+            return jsonify({'success': False, 'message': f'Invalid event: {event!r}'}), 400
+
+    scene_state = thaw_config(load_scene_state())
+    scene_state.update(data.get('scene_state', {}))
+    settings = load_settings() if data.get('use_settings', True) else None
+    try:
+        call_seconds = float(data.get('call_seconds', 0.0))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'call_seconds must be a number'}), 400
+    try:
+        rng = SceneRandom(data.get('seed'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'seed must be an integer'}), 400
+    result = simulate_scene(scene_state, settings, events, rng, call_seconds)
+    result['success'] = True
+    return jsonify(result)
+
+@app.route('/switchbot_status')
+def switchbot_status():
+    """Latest SwitchBot statuses read by the scene's status poller"""
+    if not switchbot_poller:
+        return jsonify({'devices': {}, 'stats': None})
+    return jsonify({'devices': switchbot_poller.cached_statuses(), 'stats': switchbot_poller.stats()})
+
+@app.route('/switchbot_quota')
+def switchbot_quota_status():
+    """SwitchBot API requests used/remaining today and the poll intervals in use"""
+    quota = switchbot_quota.stats()
+    quota['poll_intervals'] = switchbot_poller.intervals() if switchbot_poller else {}
+    return jsonify(quota)
+
 @app.route('/status')
 def status():
     return jsonify(get_scene_status())
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.monotonic()
+    profiler.track('request')
+
+@app.after_request
+def record_request_metrics(response):
+    # Route template, not the raw path, so the label set stays small
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    http_request_seconds.observe(time.monotonic() - g.request_start, route, request.method, response.status_code)
+    return response
+
+@app.teardown_request
+def untrack_request_thread(exc):
+    profiler.untrack()
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of device I/O, scene loop, sensor, config and HTTP metrics"""
+    for store in (settings_store, scene_state_store, switchbot_quota_store):
+        stats = store.stats()
+        config_operations.set_total(stats['hits'], store.name, 'cache_hit')
+        config_operations.set_total(stats['disk_reads'], store.name, 'disk_read')
+        config_operations.set_total(stats['disk_writes'], store.name, 'disk_write')
+        config_operations.set_total(stats['skipped_writes'], store.name, 'skipped_write')
+    switchbot_quota_remaining.set(switchbot_quota.remaining())
+
+    lines = []
+    for metric in metrics_registry:
+        lines.extend(metric.render())
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+def developer_mode_enabled():
+    return load_settings().get('interface', {}).get('developer_mode', False)
+
+@app.route('/profiler')
+def profiler_page():
+    """Developer mode page to run the sampling profiler and inspect its tables"""
+    if not developer_mode_enabled():
+        return redirect(url_for('settings'))
+    return render_template('profiler.html', settings=load_settings(), version=load_version())
+
+@app.route('/profiler/start', methods=['POST'])
+def profiler_start():
+    if not developer_mode_enabled():
+        return jsonify({'success': False, 'message': 'Developer mode is disabled'}), 403
+    try:
+        interval = float(request.values.get('interval_ms', PROFILER_INTERVAL * 1000)) / 1000
+    except ValueError:
+        return jsonify({'success': False, 'message': 'interval_ms must be a number'}), 400
+    started = profiler.start(min(max(interval, 0.001), 1.0))
+    return jsonify({'success': started, 'message': 'Profiler started' if started else 'Profiler already running',
+                    'stats': profiler.stats()})
+
+@app.route('/profiler/stop', methods=['POST'])
+def profiler_stop():
+    if not developer_mode_enabled():
+        return jsonify({'success': False, 'message': 'Developer mode is disabled'}), 403
+    stopped = profiler.stop()
+    return jsonify({'success': stopped, 'message': 'Profiler stopped' if stopped else 'Profiler was not running',
+                    'stats': profiler.stats()})
+
+@app.route('/profiler/report')
+def profiler_report():
+    """Profiler state and the per-function wall/CPU table (?sort=total_wall|self_wall|total_cpu|self_cpu&limit=)"""
+    if not developer_mode_enabled():
+        return jsonify({'success': False, 'message': 'Developer mode is disabled'}), 403
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'stats': profiler.stats(),
+                    'functions': profiler.functions(request.args.get('sort', 'total_wall'), limit)})
+
+@app.route('/profiler/collapsed')
+def profiler_collapsed():
+    """Download the profile as collapsed stacks for flamegraph.pl / speedscope"""
+    if not developer_mode_enabled():
+        return jsonify({'success': False, 'message': 'Developer mode is disabled'}), 403
+    filename = f"pilock-profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+    return Response(profiler.collapsed(), mimetype='text/plain',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@app.route('/snapshot')
+def snapshot():
+    """Scene status, device states and log tail in one versioned resource; If-None-Match gets 304
+    until something changes. Built from in-memory state only. The countdown is left to the client
+    (ends_at plus the X-Server-Time header), so a running scene doesn't change the snapshot every second."""
+    etag = f"{dashboard_epoch}.{dashboard_version}"  # Read before building: a change mid-build bumps past it
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        status = get_scene_status_event()
+        response = jsonify({
+            'version': etag,
+            'status': {'status': status['status'], 'ends_at': status['ends_at']},
+            'devices': current_device_states(),
+            'log': get_status_log()
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Browsers revalidate with If-None-Match every time
+    response.headers['X-Server-Time'] = str(time.time())
+    return response
+
+@app.route('/events')
+def events():
+    """Server-Sent Events stream of scene status, log lines, device states and notifications"""
+    client = event_broadcaster.subscribe()
+
+    def stream():
+        try:
+            # Current state first, then changes as they happen
+            yield 'retry: 2000\n\n'
+            yield EventBroadcaster.format('status', get_scene_status_event())
+            yield EventBroadcaster.format('device_states', get_device_states(load_scene_state()))
+            yield EventBroadcaster.format('log_tail', get_status_log())
+            while not client.dropped:
+                try:
+                    yield client.queue.get(timeout=SSE_HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    publish_device_states()  # Picks up scene state edited outside the app
+                    yield ': keep-alive\n\n'
+        finally:
+            event_broadcaster.unsubscribe(client)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/device_states')
 def device_states():
     """Get current enabled states of all devices"""
-    scene_state = load_scene_state()
-    states = {
-        'pishock': {},
-        'switchbot': {},
-        'custom': {}
-    }
-
-    for i in range(1, 5):
-        states['pishock'][i] = scene_state.get(f'pishock_{i}_enabled', False)
-        states['switchbot'][i] = scene_state.get(f'switchbot_{i}_enabled', False)
-        states['custom'][i] = scene_state.get(f'custom_{i}_enabled', False)
+    return jsonify(get_device_states(load_scene_state()))
+
+def notification_feed_response(feed):
+    """Notifications after ?after=<seq> (none without a cursor), optionally long-polled with ?wait=<seconds>.
+
+    Nothing is removed, so any number of clients can read the same feed; each keeps
+    the X-Last-Seq header as its next cursor.
+    """
+    after = request.args.get('after', type=int)
+    wait = min(request.args.get('wait', 0, type=float), LONG_POLL_MAX_WAIT)
+    if after is None:
+        entries, last_seq = [], feed.last_seq
+    elif wait > 0:
+        entries, last_seq, _ = feed.wait_after(after, wait)
+    else:
+        entries, last_seq, _ = feed.after(after)
 
-    return jsonify(states)
+    etag = str(last_seq)
+    if not entries and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify([dict(item, seq=seq) for seq, item in entries])
+    response.set_etag(etag)
+    response.headers['X-Last-Seq'] = etag
+    return response
 
 @app.route('/popup_notifications')
 def get_popup_notifications():
-    """Get pending popup notifications"""
-    global popup_notification_queue
-    notifications = list(popup_notification_queue)
-    popup_notification_queue.clear()  # Clear the queue after retrieving
-    return jsonify(notifications)
+    """Get popup notifications after the client's cursor"""
+    return notification_feed_response(popup_notifications)
 
 @app.route('/audio_notifications')
 def get_audio_notifications():
-    """Get pending audio notifications"""
-    global audio_notification_queue
-    notifications = list(audio_notification_queue)
-    audio_notification_queue.clear()  # Clear the queue after retrieving
-    return jsonify(notifications)
+    """Get audio notifications after the client's cursor"""
+    return notification_feed_response(audio_notifications)
 
 @app.route('/test_contact_sensor', methods=['POST'])
 def test_contact_sensor():
@@ -1050,6 +3859,7 @@ def test_contact_sensor():
                 )
 
                 # Test contact sensor status
+                switchbot_quota.record(2)  # Device lookup + status
                 device = switchbot_api.device(id=sensor_id)
                 status = device.status()
 
@@ -1145,22 +3955,26 @@ def test_killswitch():
 
             # If scene is running, simulate killswitch trigger (plug OFF)
             if scene_active:
-                print("KILLSWITCH TEST: Simulating plug OFF - triggering emergency stop")
+                sensor_log.info("KILLSWITCH TEST: Simulating plug OFF - triggering emergency stop")
+                # Unlock and call the optional API endpoint on the release's threads, so this request never waits on them
+                released = scene_lock_release is not None and scene_lock_release.trigger('killswitch_test')
                 add_status_message("Scene terminated - killswitch activated (TEST)")
                 trigger_audio_notification("Scene terminated by killswitch")
                 trigger_popup_notification('killswitch', 'activated', "Killswitch Activated - Scene Terminated (TEST)")
 
-                # Call optional API endpoint
-                api_endpoint = settings.get('killswitch', {}).get('api_endpoint', '')
-                if api_endpoint:
-                    call_webhook(api_endpoint, "Killswitch API (TEST)")
-
                 # Stop the scene
                 scene_active = False
                 scene_end_time = None
                 scene_delay_end_time = None
                 scene_in_delay = False
                 scene_execution_start_time = None
+                scene_cancel.cancel()
+                publish_scene_status()
+
+                api_endpoint = settings.get('killswitch', {}).get('api_endpoint', '')
+                if api_endpoint and not released:
+                    # Release already triggered by an earlier stop: still call the API, in the background
+                    threading.Thread(target=call_webhook, args=(api_endpoint, "Killswitch API (TEST)"), daemon=True).start()
 
                 return jsonify({
                     'success': True,
@@ -1237,15 +4051,15 @@ def test_custom_payload():
 
         # Make the request
         if method.upper() == 'GET':
-            response = requests.get(endpoint, headers=headers, timeout=10)
+            response = http_pool.request('GET', endpoint, headers=headers)
         elif method.upper() == 'POST':
-            response = requests.post(endpoint, json=payload_data, headers=headers, timeout=10)
+            response = http_pool.request('POST', endpoint, json=payload_data, headers=headers)
         elif method.upper() == 'PUT':
-            response = requests.put(endpoint, json=payload_data, headers=headers, timeout=10)
+            response = http_pool.request('PUT', endpoint, json=payload_data, headers=headers)
         elif method.upper() == 'PATCH':
-            response = requests.patch(endpoint, json=payload_data, headers=headers, timeout=10)
+            response = http_pool.request('PATCH', endpoint, json=payload_data, headers=headers)
         elif method.upper() == 'DELETE':
-            response = requests.delete(endpoint, headers=headers, timeout=10)
+            response = http_pool.request('DELETE', endpoint, headers=headers)
         else:
             return jsonify({'success': False, 'error': f'Unsupported method: {method}'})
 
@@ -1261,7 +4075,7 @@ def test_custom_payload():
         })
 
     except requests.exceptions.Timeout:
-        return jsonify({'success': False, 'error': 'Request timeout (10 seconds)'})
+        return jsonify({'success': False, 'error': f'Request timeout ({HTTP_READ_TIMEOUT} seconds)'})
     except requests.exceptions.ConnectionError:
         return jsonify({'success': False, 'error': 'Connection error - check endpoint URL'})
     except requests.exceptions.RequestException as e:
@@ -1328,16 +4142,14 @@ def trigger_contact_sensor_api(sensor_num):
                 switchbot_devices.append(None)
 
         # Check for modifiers triggered by this sensor
+        plan = load_scene_plan()
         triggered_modifiers = []
-        for modifier_i in range(1, 5):
-            if (scene_state.get(f'modifier_{modifier_i}_enabled', False) and
-                scene_state.get(f'modifier_{modifier_i}_contact_sensor', '') == str(sensor_num)):
-
-                triggered_modifiers.append(modifier_i)
-                add_status_message(f"API triggered Contact Sensor {sensor_num} - Modifier {modifier_i} activated")
-                execute_modifier_action(modifier_i, scene_state, settings,
-                                       pishock_shockers=pishock_shockers,
-                                       switchbot_devices=switchbot_devices)
+        for modifier in plan.modifiers_by_sensor.get(sensor_num, ()):
+            triggered_modifiers.append(modifier.number)
+            add_status_message(f"API triggered Contact Sensor {sensor_num} - Modifier {modifier.number} activated")
+            execute_modifier_action(modifier.number, plan, settings,
+                                   pishock_shockers=pishock_shockers,
+                                   switchbot_devices=switchbot_devices)
 
         if triggered_modifiers:
             return jsonify({
@@ -1356,12 +4168,221 @@ def trigger_contact_sensor_api(sensor_num):
             'error': f'Error triggering contact sensor {sensor_num}: {str(e)}'
         })
 
+CONTACT_OPEN_STATES = {'open': True, 'timeOutNotClose': True, 'close': False}  # SwitchBot webhook openState values
+
+def normalize_switchbot_id(device_id):
+    """SwitchBot device IDs are the MAC address without separators"""
+    return str(device_id).replace(':', '').replace('-', '').upper()
+
+def parse_contact_sensor_event(payload):
+    """Validate a SwitchBot webhook payload; returns (device ID, is_open, sample time in ms or None)"""
+    if not isinstance(payload, dict):
+        raise ValueError('Payload must be a JSON object')
+    if payload.get('eventType') != 'changeReport':
+        raise ValueError(f"Unsupported eventType: {payload.get('eventType')!r}")
+    context = payload.get('context')
+    if not isinstance(context, dict):
+        raise ValueError('Missing context object')
+    device_mac = context.get('deviceMac')
+    if not isinstance(device_mac, str) or not device_mac:
+        raise ValueError('Missing context.deviceMac')
+    open_state = context.get('openState')
+    if open_state not in CONTACT_OPEN_STATES:
+        raise ValueError(f"Unsupported openState: {open_state!r}")
+    sample_time = context.get('timeOfSample')
+    return normalize_switchbot_id(device_mac), CONTACT_OPEN_STATES[open_state], \
+        sample_time if isinstance(sample_time, (int, float)) else None
+
+@app.route('/switchbot_webhook', methods=['POST'])
+def switchbot_webhook():
+    """Receive SwitchBot contact sensor events and feed them into the open-edge detection"""
+    webhook_key = load_settings().get('contact_sensors', {}).get('webhook_key', '')
+    if not webhook_key:
+        return jsonify({'success': False, 'message': 'Push events not enabled'}), 404
+    if not hmac.compare_digest(request.args.get('key', '').encode(), webhook_key.encode()):
+        return jsonify({'success': False, 'message': 'Invalid key'}), 403
+
+    payload = request.get_json(silent=True)
+    context = payload.get('context') if isinstance(payload, dict) else None
+    if isinstance(context, dict) and context.get('deviceType', 'WoContact') != 'WoContact':
+        # SwitchBot pushes events for every device on the account
+        return jsonify({'success': True, 'message': 'Ignored - not a contact sensor'})
+    try:
+        device_id, is_open, sample_time = parse_contact_sensor_event(payload)
+    except ValueError as e:
+        sensor_log.info(f"CONTACT SENSOR WEBHOOK: Rejected payload - {e}")
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    if not scene_active or scene_cancel.is_cancelled():
+        return jsonify({'success': True, 'message': 'Ignored - no active scene'})
+    with contact_sensor_lock:
+        sensor_num = next((num for num, sensor_id in contact_sensor_devices.items()
+                           if normalize_switchbot_id(sensor_id) == device_id), None)
+    if sensor_num is None:
+        return jsonify({'success': True, 'message': 'Ignored - sensor not monitored by the current scene'})
+
+    delay = f" ({time.time() * 1000 - sample_time:.0f} ms after sample)" if sample_time else ""
+    sensor_log.info(f"CONTACT SENSOR {sensor_num}: Push event {'OPEN' if is_open else 'CLOSED'}{delay}")
+    process_contact_sensor_state(sensor_num, is_open, source='push', detected_at=g.request_start)
+    return jsonify({'success': True, 'sensor': sensor_num, 'open': is_open})
+
+@app.route('/register_switchbot_webhook', methods=['POST'])
+def register_switchbot_webhook():
+    """Ask SwitchBot to push device events to this PiLock's /switchbot_webhook"""
+    settings = load_settings()
+    webhook_key = settings.get('contact_sensors', {}).get('webhook_key', '')
+    if not settings.get('switchbot', {}).get('token'):
+        return jsonify({'success': False, 'message': 'SwitchBot token not configured'})
+    if not webhook_key:
+        return jsonify({'success': False, 'message': 'Webhook key not configured'})
+
+    # Behind a tunnel/reverse proxy the public base URL differs from the one the browser used
+    base_url = ((request.get_json(silent=True) or {}).get('base_url') or request.host_url).rstrip('/')
+    url = f"{base_url}/switchbot_webhook?key={webhook_key}"
+    try:
+        switchbot_api = SwitchBot(token=settings['switchbot']['token'], secret=settings['switchbot']['secret'])
+        switchbot_quota.record()
+        switchbot_api.client.post('webhook/setupWebhook', json={'action': 'setupWebhook', 'url': url, 'deviceList': 'ALL'})
+        add_status_message("SwitchBot webhook registered")
+        return jsonify({'success': True, 'message': f'SwitchBot will push events to {base_url}/switchbot_webhook'})
+    except Exception as e:
+        add_status_message(f"SwitchBot webhook registration failed - {str(e)}")
+        return jsonify({'success': False, 'message': f'Registration failed: {str(e)}'})
+
+def activate_pishock(device, cancel, dry_run=False, record=None):
+    """Run one PiShock activation (notify, vibrate, shock); aborts between steps if the scene stops"""
+    i = device.number
+    device_key = device.key
+    try:
+        params = scene_random.stream(f'{device_key}.params')
+        intensity = device.intensity.sample(params)
+        duration_val = device.duration.sample(params)
+        if record:
+            record.params = {'intensity': intensity, 'duration': duration_val}
+
+        if dry_run:
+            device_log.info(f"PISHOCK {i} (DRY RUN): Triggering shock (intensity: {intensity}, duration: {duration_val}s)")
+            add_status_message(f"Haptic Module {i} activated ({device_counts[device_key] + 1} times) (DRY RUN)")
+            # Trigger notifications for dry run
+            trigger_popup_notification('pishock', i, f"Intensity: {intensity} | Duration: {duration_val}s (DRY RUN)")
+            trigger_audio_notification(f"Shock {intensity} dry run")
+        else:
+            # Trigger notifications 2 seconds before vibration
+            trigger_popup_notification('pishock', i, f"Intensity: {intensity} | Duration: {duration_val}s")
+            trigger_audio_notification(f"Shock {intensity}")
+            device_log.info(f"PISHOCK {i}: Pre-notification sent, waiting {PISHOCK_NOTIFY_LEAD} seconds...")
+            add_status_message(f"Haptic Module {i} notification sent, vibration in {PISHOCK_NOTIFY_LEAD} seconds...")
+
+            if not cancel.sleep(PISHOCK_NOTIFY_LEAD):
+                raise SceneCancelled()
+
+            # Execute vibration
+            run_cancellable(cancel, timed_call, 'vibrate', monitoring_pishock_shockers[i].vibrate,
+                            duration=duration_val, intensity=intensity)
+            device_log.info(f"PISHOCK {i}: Vibration executed, waiting {PISHOCK_SHOCK_GAP} second before shock...")
+
+            if not cancel.sleep(PISHOCK_SHOCK_GAP):
+                raise SceneCancelled()
+
+            # Execute shock
+            run_cancellable(cancel, timed_call, 'shock', monitoring_pishock_shockers[i].shock,
+                            duration=duration_val, intensity=intensity)
+            device_log.info(f"PISHOCK {i}: Shock delivered (intensity: {intensity}, duration: {duration_val}s)")
+            add_status_message(f"Haptic Module {i} activated ({device_counts[device_key] + 1} times)")
+
+        device_counts[device_key] += 1
+        return True
+    except SceneCancelled:
+        device_log.info(f"PISHOCK {i}: Activation aborted - scene stopped")
+        return False
+    except Exception as e:
+        device_log.error(f"PISHOCK {i} ERROR: Trigger failed - {e}")
+        add_status_message(f"Haptic Module {i} failed to activate")
+        return False
+
+def activate_switchbot(device, cancel, dry_run=False, record=None):
+    """Run one SwitchBot press"""
+    i = device.number
+    device_key = device.key
+    try:
+        duration_val = device.duration.sample(scene_random.stream(f'{device_key}.params'))
+        if record:
+            record.params = {'duration': duration_val}
+
+        if dry_run:
+            device_log.info(f"SWITCHBOT {i} (DRY RUN): Triggering press (duration: {duration_val}s)")
+            add_status_message(f"Switchbot {i} activated ({device_counts[device_key] + 1} times) (DRY RUN)")
+        else:
+            device_log.info(f"SWITCHBOT {i}: Triggering press (duration: {duration_val}s)")
+            switchbot_quota.record()
+            run_cancellable(cancel, timed_call, 'press', monitoring_switchbot_devices[i].press)
+            add_status_message(f"Switchbot {i} activated ({device_counts[device_key] + 1} times)")
+
+        device_counts[device_key] += 1
+        # Trigger popup notification
+        trigger_popup_notification('switchbot', i, f"Button Press | Duration: {duration_val}s" + (" (DRY RUN)" if dry_run else ""))
+        # Trigger audio notification
+        trigger_audio_notification(f"Switchbot {i}" + (" dry run" if dry_run else ""))
+        # Note: Switchbot press duration is handled internally, no need for blocking sleep
+        return True
+    except SceneCancelled:
+        device_log.info(f"SWITCHBOT {i}: Activation aborted - scene stopped")
+        return False
+    except Exception as e:
+        device_log.error(f"SWITCHBOT {i} ERROR: Trigger failed - {e}")
+        add_status_message(f"Switchbot {i} failed to activate")
+        return False
+
+def activate_custom(device, settings, cancel, dry_run=False):
+    """Run one custom accessory API call"""
+    i = device.number
+    device_key = device.key
+
+    # Get endpoint configuration
+    endpoint_url = settings.get('custom_accessories', {}).get(f'endpoint_{i}', '')
+    payload = settings.get('custom_accessories', {}).get(f'payload_{i}', '{}')
+    method = settings.get('custom_accessories', {}).get(f'method_{i}', 'POST')
+
+    try:
+        if dry_run:
+            device_log.info(f"CUSTOM {i} (DRY RUN): Triggering API call ({method} {endpoint_url})")
+        else:
+            device_log.info(f"CUSTOM {i}: Triggering API call ({method} {endpoint_url})")
+        success = run_cancellable(cancel, call_custom_api, endpoint_url, method, payload, i,
+                                  f"Custom Accessory {i}", dry_run)
+
+        if success:
+            device_counts[device_key] += 1
+            add_status_message(f"Custom {i} activated ({device_counts[device_key]} times)" + (" (DRY RUN)" if dry_run else ""))
+            # Trigger popup notification
+            trigger_popup_notification('custom', i, f"{method} API Call | Endpoint: {endpoint_url}" + (" (DRY RUN)" if dry_run else ""))
+            # Trigger audio notification
+            trigger_audio_notification(f"Custom {i}" + (" dry run" if dry_run else ""))
+        return success
+    except SceneCancelled:
+        device_log.info(f"CUSTOM {i}: API call abandoned - scene stopped")
+        return False
+    except Exception as e:
+        device_log.error(f"CUSTOM {i} ERROR: API call failed - {e}")
+        add_status_message(f"Custom {i} failed to activate")
+        return False
+
+def activate_device(device, settings, cancel, dry_run=False, record=None):
+    """Dispatch one scheduled activation to the device type's handler; record gets the drawn parameters"""
+    if cancel.is_cancelled():
+        return False
+    if device.kind == 'pishock':
+        return activate_pishock(device, cancel, dry_run, record)
+    if device.kind == 'switchbot':
+        return activate_switchbot(device, cancel, dry_run, record)
+    return activate_custom(device, settings, cancel, dry_run)
+
 def get_scene_status():
     global scene_active, scene_end_time, scene_delay_end_time, scene_in_delay, scene_execution_start_time
     if scene_active:
         if scene_in_delay and scene_delay_end_time:
             # During delay phase, show seconds remaining in delay
-            remaining = max(0, int((scene_delay_end_time - datetime.now()).total_seconds()))
+            remaining = max(0, int(scene_delay_end_time - time.monotonic()))
             return {
                 'status': 'Waiting',
                 'remaining_minutes': remaining // 60,
@@ -1369,7 +4390,7 @@ def get_scene_status():
             }
         elif not scene_in_delay and scene_end_time:
             # During scene execution, show scene time remaining
-            remaining = max(0, int((scene_end_time - datetime.now()).total_seconds()))
+            remaining = max(0, int(scene_end_time - time.monotonic()))
             return {
                 'status': 'Running', 
                 'remaining_minutes': remaining // 60,
@@ -1377,16 +4398,52 @@ def get_scene_status():
             }
     return {'status': 'Idle', 'remaining_minutes': 0, 'remaining_seconds': 0}
 
-def run_scene(dry_run=False):
+def run_scene(dry_run=False, seed=None, replay=None):
+    """Run one scene. seed fixes every random draw; replay is a saved recording to re-execute
+    (its config, draws and outside events, without the initial delay)."""
     global scene_active, scene_end_time, scene_delay_end_time, scene_in_delay, scene_execution_start_time
-    global original_device_states
+    global original_device_states, scene_cancel, last_stop_latency, scene_lock_release, activation_timeline
+    global scene_random, scene_recorder, scene_report, replay_scene_state
+
+    # Fresh cancellation token per scene so late calls from a previous scene can't see this one
+    cancel = scene_cancel = SceneCancellation()
 
     if dry_run:
-        print("SCENE: Loading settings and scene state (DRY RUN MODE)")
+        scene_log.info("SCENE: Loading settings and scene state (DRY RUN MODE)")
     else:
-        print("SCENE: Loading settings and scene state")
+        scene_log.info("SCENE: Loading settings and scene state")
     settings = load_settings()
+    with replay_scene_state_lock:
+        # A replay runs the recorded config from memory, so the user's scene_state.json is never touched
+        replay_scene_state = freeze_config(dict(replay['scene_state'], initial_delay=0)) if replay else None
+    if replay:
+        publish_device_states()
+        seed = replay['seed']
     scene_state = load_scene_state()
+    rng = scene_random = SceneRandom(seed, replay['draws'] if replay else None)
+    recorder = scene_recorder = SceneRecorder(rng, scene_state, dry_run, replay['id'] if replay else None)
+    scene_log.info(f"SCENE: Random seed {rng.seed}" + (f" (replaying {replay['id']})" if replay else ""))
+    report = scene_report = SceneReport(recorder, 0 if replay else scene_state['initial_delay'])
+    event_journal.scene_id = recorder.id
+    event_journal.record('scene', "Scene started", data={'seed': rng.seed, 'dry_run': dry_run,
+                                                         'replay_of': recorder.replay_of})
+    release = scene_lock_release = LockRelease(settings, dry_run)
+
+    if not dry_run:
+        # Open connections to the lock and accessory hosts during the initial delay so the
+        # engage/disengage and first accessory calls are a single round trip
+        prewarm_urls = [
+            settings.get('lock', {}).get('engage_webhook', ''),
+            settings.get('lock', {}).get('disengage_webhook', ''),
+            settings.get('killswitch', {}).get('api_endpoint', '')
+        ] + [settings.get('custom_accessories', {}).get(f'endpoint_{i}', '') for i in range(1, 5)]
+        prewarm_delay = max(0, scene_state.get('initial_delay', 0) - HTTP_PREWARM_LEAD)
+
+        def prewarm():
+            if cancel.sleep(prewarm_delay):
+                http_pool.prewarm(prewarm_urls)
+
+        threading.Thread(target=prewarm, daemon=True).start()
 
     # Save original device states before scene starts
     original_device_states = {
@@ -1394,39 +4451,36 @@ def run_scene(dry_run=False):
         'switchbot': {i: scene_state.get(f'switchbot_{i}_enabled', False) for i in range(1, 5)},
         'custom': {i: scene_state.get(f'custom_{i}_enabled', False) for i in range(1, 5)}
     }
-    print(f"SCENE: Saved original device states: {original_device_states}")
+    scene_log.info(f"SCENE: Saved original device states: {original_device_states}")
 
     scene_active = True
     scene_in_delay = False  # Initialize delay flag
     executed_modifiers.clear()  # Reset executed modifiers for new scene
-    status_messages.clear()  # Clear status log for new scene
     
     # Determine scene duration first
+    duration = sample_scene_duration(scene_state, rng.stream('duration'))
     if scene_state['scene_duration_type'] == 'fixed':
-        duration = scene_state['scene_duration_fixed'] * 60  # Convert to seconds
-        print(f"SCENE: Fixed duration of {scene_state['scene_duration_fixed']} minutes ({duration} seconds)")
+        scene_log.info(f"SCENE: Fixed duration of {scene_state['scene_duration_fixed']} minutes ({duration} seconds)")
     else:
-        duration = random.randint(
-            scene_state['scene_duration_random_min'] * 60,
-            scene_state['scene_duration_random_max'] * 60
-        )
-        print(f"SCENE: Random duration of {duration//60} minutes ({duration} seconds)")
+        scene_log.info(f"SCENE: Random duration of {duration//60} minutes ({duration} seconds)")
     
     # Set up timing for delay and scene phases
     initial_delay = scene_state['initial_delay']
     
     if initial_delay > 0:
         # Set delay end time and scene end time separately
-        scene_delay_end_time = datetime.now() + timedelta(seconds=initial_delay)
-        scene_end_time = datetime.now() + timedelta(seconds=initial_delay + duration)
+        scene_delay_end_time = time.monotonic() + initial_delay
+        scene_end_time = time.monotonic() + initial_delay + duration
         scene_in_delay = True
     else:
         # No delay, go straight to scene execution
         scene_delay_end_time = None
-        scene_end_time = datetime.now() + timedelta(seconds=duration)
+        scene_end_time = time.monotonic() + duration
         scene_in_delay = False
+    publish_scene_status()
     
     add_status_message(f"Scene Duration: {duration//60}m")
+    add_status_message(f"Scene seed: {rng.seed}" + (f" (replay of {replay['id']})" if replay else ""))
     
     # Initial delay
     if initial_delay > 0:
@@ -1437,25 +4491,29 @@ def run_scene(dry_run=False):
             delay_display = f"{delay_minutes}m" + (f" {delay_seconds}s" if delay_seconds > 0 else "")
         else:
             delay_display = f"{delay_seconds}s"
-        print(f"SCENE: Initial delay of {initial_delay} seconds")
+        scene_log.info(f"SCENE: Initial delay of {initial_delay} seconds")
         add_status_message(f"Waiting {delay_display} before starting...")
         
-        # Sleep in small increments to allow stopping during delay
-        delay_elapsed = 0
-        while delay_elapsed < initial_delay and scene_active:
-            time.sleep(1)
-            delay_elapsed += 1
+        # Wait until the delay ends, waking early if the scene is stopped
+        delay_end = scene_delay_end_time
+        while not cancel.is_cancelled() and delay_end and time.monotonic() < delay_end:
+            cancel.wait_for_wakeup(delay_end - time.monotonic())
+            delay_end = scene_delay_end_time
         
-        if not scene_active:
+        if cancel.is_cancelled():
+            event_journal.record('scene', "Scene ended", data={'end_reason': 'stopped', 'duration_seconds': 0})
+            event_journal.scene_id = None
+            scene_report = None
             return  # Scene was stopped during delay
             
         scene_in_delay = False  # Clear delay flag
         # Update scene end time for just the scene duration (not including delay)
-        scene_end_time = datetime.now() + timedelta(seconds=duration)
+        scene_end_time = time.monotonic() + duration
+        publish_scene_status()
         add_status_message("Initial delay complete - scene starting now...")
     
     # Mark when actual scene execution starts
-    scene_execution_start_time = datetime.now()
+    scene_execution_start_time = time.monotonic()
 
     # Announce scene start with duration
     duration_minutes = duration // 60
@@ -1464,25 +4522,27 @@ def run_scene(dry_run=False):
     # Engage lock
     if settings.get('lock', {}).get('engage_webhook'):
         if dry_run:
-            print("LOCK: Engaging lock via webhook (DRY RUN)")
+            lock_log.info("LOCK: Engaging lock via webhook (DRY RUN)")
         else:
-            print("LOCK: Engaging lock via webhook")
-        call_webhook(settings.get('lock', {}).get('engage_webhook'), "Activate Lock: ", dry_run)
-        trigger_popup_notification('lock', 'engage', "Lock Engaged" + (" (DRY RUN)" if dry_run else ""))
+            lock_log.info("LOCK: Engaging lock via webhook")
+        if release.engage():
+            trigger_popup_notification('lock', 'engage', "Lock Engaged" + (" (DRY RUN)" if dry_run else ""))
     
     # Initialize APIs
     global monitoring_pishock_shockers, monitoring_switchbot_devices, monitoring_switchbot_api, monitoring_pishock_api, device_counts, device_max_counts
+    global switchbot_poller
     switchbot_api = None
     pishock_api = None
     monitoring_pishock_shockers = {}  # Reset global references
     monitoring_switchbot_devices = {}  # Reset global references
     monitoring_switchbot_api = None
     monitoring_pishock_api = None
+    poller = switchbot_poller = None
     device_counts = {}
     device_max_counts = {}
 
     if dry_run:
-        print("API: Skipping real API initialization (DRY RUN MODE)")
+        api_log.info("API: Skipping real API initialization (DRY RUN MODE)")
         add_status_message("API initialization skipped (DRY RUN)")
         # In dry run mode, simulate device initialization for enabled devices
         for i in range(1, 5):
@@ -1496,32 +4556,34 @@ def run_scene(dry_run=False):
         # Initialize Switchbot API
         if settings.get('switchbot', {}).get('token'):
             try:
-                print("API: Initializing Switchbot API")
+                api_log.info("API: Initializing Switchbot API")
                 monitoring_switchbot_api = SwitchBot(
                     token=settings['switchbot']['token'],
                     secret=settings['switchbot']['secret']
                 )
+                # All SwitchBot device lookups and status reads for this scene go through one poller
+                poller = switchbot_poller = SwitchBotStatusPoller(monitoring_switchbot_api, cancel)
 
                 # Initialize Switchbot devices
                 for i in range(1, 5):
                     device_id = settings.get('switchbot', {}).get(f'device_{i}_id', '')
                     if device_id and scene_state.get(f'switchbot_{i}_enabled', False):
                         try:
-                            monitoring_switchbot_devices[i] = monitoring_switchbot_api.device(id=device_id)
-                            print(f"API: Switchbot device {i} initialized (ID: {device_id})")
+                            monitoring_switchbot_devices[i] = poller.device(device_id)
+                            api_log.info(f"API: Switchbot device {i} initialized (ID: {device_id})")
                             add_status_message(f"Switchbot {i} ready")
                         except Exception as e:
-                            print(f"API ERROR: Switchbot device {i} initialization failed - {e}")
+                            api_log.error(f"API ERROR: Switchbot device {i} initialization failed - {e}")
                             add_status_message(f"Switchbot {i} failed to initialize")
             except Exception as e:
-                print(f"API ERROR: Switchbot API initialization failed - {e}")
+                api_log.error(f"API ERROR: Switchbot API initialization failed - {e}")
                 add_status_message("Switchbot API initialization failed")
 
         # Initialize PiShock API
         if settings.get('pishock', {}).get('username'):
             try:
-                print("API: Initializing PiShock API")
-                monitoring_pishock_api = PiShockAPI(
+                api_log.info("API: Initializing PiShock API")
+                monitoring_pishock_api = pishock_api_class(
                     settings['pishock']['username'],
                     settings['pishock']['api_key']
                 )
@@ -1532,13 +4594,13 @@ def run_scene(dry_run=False):
                     if sharecode and scene_state.get(f'pishock_{i}_enabled', False):
                         try:
                             monitoring_pishock_shockers[i] = monitoring_pishock_api.shocker(sharecode)
-                            print(f"API: PiShock device {i} initialized (Sharecode: {sharecode})")
+                            api_log.info(f"API: PiShock device {i} initialized (Sharecode: {sharecode})")
                             add_status_message(f"Haptic Module {i} ready")
                         except Exception as e:
-                            print(f"API ERROR: PiShock device {i} initialization failed - {e}")
+                            api_log.error(f"API ERROR: PiShock device {i} initialization failed - {e}")
                             add_status_message(f"Haptic Module {i} failed to initialize")
             except Exception as e:
-                print(f"API ERROR: PiShock API initialization failed - {e}")
+                api_log.error(f"API ERROR: PiShock API initialization failed - {e}")
                 add_status_message("Haptic API initialization failed")
 
     # Initialize counters for all devices (no repeat limits - unlimited usage)
@@ -1555,253 +4617,277 @@ def run_scene(dry_run=False):
         device_max_counts[f'custom_{i}'] = None  # Unlimited repeats
 
     # Initialize contact sensor state tracking for modifiers
-    global contact_sensor_states, contact_sensor_devices, contact_sensor_monitor_thread
-    contact_sensor_states = {}
-    contact_sensor_devices = {}
+    global contact_sensor_states, contact_sensor_devices
+    with contact_sensor_lock:
+        contact_sensor_states = {}
+        contact_sensor_devices = {}
+
+    sensor_ids = {}
+    if poller:
+        for i in range(1, 5):
+            sensor_id = settings.get('contact_sensors', {}).get(f'sensor_{i}_id', '')
+            if sensor_id:
+                sensor_ids[i] = sensor_id
+                poller.fetch_async(sensor_id)  # Initial reads run in parallel
 
     # Initialize contact sensors for monitoring - only if in CLOSED state
-    for i in range(1, 5):
-        sensor_id = settings.get('contact_sensors', {}).get(f'sensor_{i}_id', '')
-        if sensor_id and monitoring_switchbot_api:
-            try:
-                # Get initial state first
-                initial_state = check_contact_sensor_status(monitoring_switchbot_api, sensor_id)
+    for i, sensor_id in sensor_ids.items():
+        try:
+            # Get initial state first
+            initial_state = is_contact_open(poller.get_status(sensor_id))
 
-                # Only add sensor if it's CLOSED (False means closed)
-                if not initial_state:  # Closed state
-                    contact_sensor_devices[i] = monitoring_switchbot_api.device(id=sensor_id)
+            # Only add sensor if it's CLOSED (False means closed)
+            if not initial_state:  # Closed state
+                with contact_sensor_lock:
+                    contact_sensor_devices[i] = sensor_id
                     contact_sensor_states[i] = initial_state
-                    print(f"CONTACT SENSOR: Sensor {i} initialized (ID: {sensor_id}) - State: CLOSED")
-                    add_status_message(f"Contact Sensor {i} ready - CLOSED")
-                else:  # Open state - ignore
-                    print(f"CONTACT SENSOR: Sensor {i} (ID: {sensor_id}) is OPEN - ignoring for scene")
-                    add_status_message(f"Contact Sensor {i} ignored - not in CLOSED state")
-            except Exception as e:
-                print(f"CONTACT SENSOR ERROR: Failed to initialize sensor {i} - {e}")
-                add_status_message(f"Contact Sensor {i} error - ignoring for scene")
-
-    # Start contact sensor monitoring thread if any sensors are configured
-    if contact_sensor_devices and not dry_run:
-        contact_sensor_monitor_thread = threading.Thread(target=monitor_contact_sensors, daemon=True)
-        contact_sensor_monitor_thread.start()
-        print("CONTACT SENSOR MONITOR: Background monitoring thread started")
-    elif contact_sensor_devices and dry_run:
-        print("CONTACT SENSOR MONITOR: Skipping background thread (DRY RUN)")
-
-    start_time = time.time()
-    print(f"SCENE: Scene execution starting - will run for {duration} seconds")
+                sensor_log.info(f"CONTACT SENSOR: Sensor {i} initialized (ID: {sensor_id}) - State: CLOSED")
+                add_status_message(f"Contact Sensor {i} ready - CLOSED")
+            else:  # Open state - ignore
+                sensor_log.info(f"CONTACT SENSOR: Sensor {i} (ID: {sensor_id}) is OPEN - ignoring for scene")
+                add_status_message(f"Contact Sensor {i} ignored - not in CLOSED state")
+        except Exception as e:
+            sensor_log.error(f"CONTACT SENSOR ERROR: Failed to initialize sensor {i} - {e}")
+            add_status_message(f"Contact Sensor {i} error - ignoring for scene")
+
+    # Watch the closed sensors; status changes feed the open-edge detection. With SwitchBot
+    # pushing events to /switchbot_webhook, polling only reconciles missed events.
+    if settings.get('contact_sensors', {}).get('webhook_key'):
+        sensor_poll_interval = CONTACT_SENSOR_RECONCILE_INTERVAL
+        sensor_log.info(f"CONTACT SENSOR: Push events enabled - polling every {sensor_poll_interval}s as fallback")
+    else:
+        sensor_poll_interval = CONTACT_SENSOR_POLL_INTERVAL
+    for i, sensor_id in contact_sensor_devices.items():
+        poller.watch(sensor_id, sensor_poll_interval, priority=1)
+        poller.subscribe(sensor_id, lambda device_id, status, previous, sensor_num=i:
+                         process_contact_sensor_state(sensor_num, is_contact_open(status)))
 
     # Get killswitch settings
     killswitch_plug_id = settings.get('killswitch', {}).get('plug_id', '')
-    killswitch_api_endpoint = settings.get('killswitch', {}).get('api_endpoint', '')
-    killswitch_enabled = False  # Track if killswitch is actually monitoring
+    killswitch_tripped = threading.Event()
+
+    def trip_killswitch():
+        report.killswitch_at = time.monotonic()
+        killswitch_tripped.set()
+        recorder.event('killswitch')
+        event_journal.record('killswitch', "Killswitch tripped", 'killswitch')
+        # Unlock and call the killswitch API straight from the poller
+        release.trigger('killswitch')
+        cancel.wake()
 
     # Verify killswitch is ON and connected before enabling monitoring
-    if killswitch_plug_id and monitoring_switchbot_api:
+    if killswitch_plug_id and poller:
         try:
-            killswitch_status = check_killswitch_status(monitoring_switchbot_api, killswitch_plug_id)
+            killswitch_status = is_plug_on(poller.get_status(killswitch_plug_id))
             if killswitch_status:  # Plug is ON
-                killswitch_enabled = True
-                print(f"KILLSWITCH: Plug verified ON (ID: {killswitch_plug_id}) - monitoring enabled")
+                sensor_log.info(f"KILLSWITCH: Plug verified ON (ID: {killswitch_plug_id}) - monitoring enabled")
                 add_status_message("Killswitch monitoring enabled")
+
+                def on_killswitch_status(device_id, status, previous):
+                    if not is_plug_on(status) and not killswitch_tripped.is_set():
+                        trip_killswitch()
+
+                poller.subscribe(killswitch_plug_id, on_killswitch_status)
+                poller.watch(killswitch_plug_id, KILLSWITCH_POLL_INTERVAL, priority=0)  # Funded before sensors
             else:  # Plug is OFF or disconnected
-                print(f"KILLSWITCH: Plug is OFF or disconnected (ID: {killswitch_plug_id}) - ignoring for scene")
+                sensor_log.info(f"KILLSWITCH: Plug is OFF or disconnected (ID: {killswitch_plug_id}) - ignoring for scene")
                 add_status_message("Killswitch ignored - plug not ON")
-                killswitch_plug_id = ''  # Disable monitoring
         except Exception as e:
-            print(f"KILLSWITCH ERROR: Failed to verify plug status - {e}")
+            sensor_log.error(f"KILLSWITCH ERROR: Failed to verify plug status - {e}")
             add_status_message("Killswitch error - ignoring for scene")
-            killswitch_plug_id = ''  # Disable monitoring
 
-    # Use scene_end_time for loop condition so modifiers can extend the scene
-    while datetime.now() < scene_end_time and scene_active:
-        # Reload scene state each iteration to pick up modifier changes
-        scene_state = load_scene_state()
+    if poller:
+        poller.start()
 
-        # Check killswitch status every loop iteration
-        if killswitch_plug_id and not check_killswitch_status(monitoring_switchbot_api, killswitch_plug_id):
-            print("KILLSWITCH: Plug turned off - terminating scene")
+    def device_ready(device):
+        """Whether a device has what it needs to fire and hasn't hit its repeat limit"""
+        max_count = device_max_counts[device.key]
+        if max_count is not None and device_counts[device.key] >= max_count:
+            return False
+        if device.kind == 'pishock':
+            return device.number in monitoring_pishock_shockers
+        if device.kind == 'switchbot':
+            return device.number in monitoring_switchbot_devices
+        return bool(settings.get('custom_accessories', {}).get(f'endpoint_{device.number}', ''))
+
+    start_time = recorder.origin = time.monotonic()
+    scene_log.info(f"SCENE: Scene execution starting - will run for {duration} seconds")
+    scheduler = DeviceScheduler(rng)
+    actuators = ActuatorPool()
+    last_lag = None  # Dispatch lag of the previous activation, for jitter
+    timeline = activation_timeline = ActivationTimeline(start_time)
+
+    def journal_activation(record):
+        data = {'outcome': record.outcome, 'planned_ms': timeline._relative_ms(record.planned)}
+        if record.started is not None:
+            data['lateness_ms'] = round((record.started - record.planned) * 1000)
+            data['call_ms'] = round((record.finished - record.started) * 1000)
+        if record.params:
+            data['params'] = record.params
+        event_journal.record('activation', f"{record.device_key} {record.outcome}", record.device_key, data)
+
+    def run_activation(record, device):
+        record.started = time.monotonic()
+        ok = activate_device(device, settings, cancel, dry_run, record)
+        record.finish('ok' if ok else 'cancelled' if cancel.is_cancelled() else 'failed')
+        journal_activation(record)
+
+    def replay_events():
+        """Inject the recording's modifier, killswitch and stop events at their recorded offsets"""
+        for event in sorted(replay['events'], key=lambda event: event['at']):
+            if not cancel.sleep(start_time + event['at'] - time.monotonic()):
+                return
+            if event['type'] == 'modifier':
+                modifier_log.info(f"MODIFIER {event['modifier']}: Triggered by replay")
+                execute_modifier_action(event['modifier'], load_scene_plan(), settings)
+            elif event['type'] == 'killswitch' and not killswitch_tripped.is_set():
+                trip_killswitch()
+            elif event['type'] == 'stop':
+                request_scene_stop()
+
+    if replay:
+        threading.Thread(target=profiled('scene', replay_events), daemon=True).start()
+
+    # Sleep until the earliest device deadline or scene end; the killswitch watcher, modifiers,
+    # extensions and stop requests wake the thread early through the cancellation token
+    while not cancel.is_cancelled():
+        now = time.monotonic()
+        end_time = scene_end_time
+        if end_time is None or now >= end_time:
+            break
+
+        # Killswitch watcher already triggered the lock release; just report and end
+        if killswitch_tripped.is_set():
+            sensor_log.info("KILLSWITCH: Plug turned off - terminating scene")
             add_status_message("Scene terminated - killswitch activated")
             trigger_audio_notification("Scene terminated by killswitch")
             trigger_popup_notification('killswitch', 'activated', "Killswitch Activated - Scene Terminated")
-            call_killswitch_api(killswitch_api_endpoint)
             break
 
-        # Note: Contact sensor monitoring is now handled by a separate background thread
-        # to avoid blocking during device activation delays
-
-        current_time = time.time() - start_time
-        
-        # Process PiShock devices
-        for i in range(1, 5):
-            device_key = f'pishock_{i}'
-            if (scene_state.get(f'{device_key}_enabled', False) and
-                i in monitoring_pishock_shockers and
-                (device_max_counts[device_key] is None or device_counts[device_key] < device_max_counts[device_key])):
-                
-                if scene_state.get(f'{device_key}_interval_type') == 'fixed':
-                    next_interval = scene_state.get(f'{device_key}_interval_fixed', 5)
-                else:
-                    next_interval = random.randint(
-                        scene_state.get(f'{device_key}_interval_random_min', 2),
-                        scene_state.get(f'{device_key}_interval_random_max', 10)
-                    )
-                
-                if current_time >= next_interval * (device_counts[device_key] + 1):
-                    try:
-                        intensity = get_parameter_value(scene_state, device_key, 'intensity', 25)
-                        duration_val = get_parameter_value(scene_state, device_key, 'duration', 1)
-
-                        if dry_run:
-                            print(f"PISHOCK {i} (DRY RUN): Triggering shock (intensity: {intensity}, duration: {duration_val}s)")
-                            add_status_message(f"Haptic Module {i} activated ({device_counts[device_key] + 1} times) (DRY RUN)")
-                            # Trigger notifications for dry run
-                            trigger_popup_notification('pishock', i, f"Intensity: {intensity} | Duration: {duration_val}s (DRY RUN)")
-                            trigger_audio_notification(f"Shock {intensity} dry run")
-                        else:
-                            # Trigger notifications 2 seconds before vibration
-                            trigger_popup_notification('pishock', i, f"Intensity: {intensity} | Duration: {duration_val}s")
-                            trigger_audio_notification(f"Shock {intensity}")
-                            print(f"PISHOCK {i}: Pre-notification sent, waiting 2 seconds...")
-                            add_status_message(f"Haptic Module {i} notification sent, vibration in 2 seconds...")
-
-                            # Wait 2 seconds
-                            time.sleep(2)
-
-                            # Execute vibration
-                            monitoring_pishock_shockers[i].vibrate(duration=duration_val, intensity=intensity)
-                            print(f"PISHOCK {i}: Vibration executed, waiting 1 second before shock...")
-
-                            # Wait 1 second after vibration
-                            time.sleep(1)
-
-                            # Execute shock
-                            monitoring_pishock_shockers[i].shock(duration=duration_val, intensity=intensity)
-                            print(f"PISHOCK {i}: Shock delivered (intensity: {intensity}, duration: {duration_val}s)")
-                            add_status_message(f"Haptic Module {i} activated ({device_counts[device_key] + 1} times)")
-
-                        device_counts[device_key] += 1
-                    except Exception as e:
-                        print(f"PISHOCK {i} ERROR: Trigger failed - {e}")
-                        add_status_message(f"Haptic Module {i} failed to activate")
-        
-        # Process Switchbot devices
-        for i in range(1, 5):
-            device_key = f'switchbot_{i}'
-            if (scene_state.get(f'{device_key}_enabled', False) and
-                i in monitoring_switchbot_devices and
-                (device_max_counts[device_key] is None or device_counts[device_key] < device_max_counts[device_key])):
-                
-                if scene_state.get(f'{device_key}_interval_type') == 'fixed':
-                    next_interval = scene_state.get(f'{device_key}_interval_fixed', 5)
-                else:
-                    next_interval = random.randint(
-                        scene_state.get(f'{device_key}_interval_random_min', 2),
-                        scene_state.get(f'{device_key}_interval_random_max', 10)
-                    )
-                
-                if current_time >= next_interval * (device_counts[device_key] + 1):
-                    try:
-                        duration_val = get_parameter_value(scene_state, device_key, 'duration', 1)
-
-                        if dry_run:
-                            print(f"SWITCHBOT {i} (DRY RUN): Triggering press (duration: {duration_val}s)")
-                            add_status_message(f"Switchbot {i} activated ({device_counts[device_key] + 1} times) (DRY RUN)")
-                        else:
-                            print(f"SWITCHBOT {i}: Triggering press (duration: {duration_val}s)")
-                            monitoring_switchbot_devices[i].press()
-                            add_status_message(f"Switchbot {i} activated ({device_counts[device_key] + 1} times)")
-
-                        device_counts[device_key] += 1
-                        # Trigger popup notification
-                        trigger_popup_notification('switchbot', i, f"Button Press | Duration: {duration_val}s" + (" (DRY RUN)" if dry_run else ""))
-                        # Trigger audio notification
-                        trigger_audio_notification(f"Switchbot {i}" + (" dry run" if dry_run else ""))
-                        # Note: Switchbot press duration is handled internally, no need for blocking sleep
-                    except Exception as e:
-                        print(f"SWITCHBOT {i} ERROR: Trigger failed - {e}")
-                        add_status_message(f"Switchbot {i} failed to activate")
-
-        # Process Custom Accessories
-        for i in range(1, 5):
-            device_key = f'custom_{i}'
-            if (scene_state.get(f'{device_key}_enabled', False) and
-                (device_max_counts[device_key] is None or device_counts[device_key] < device_max_counts[device_key])):
-
-                # Get endpoint configuration
-                endpoint_url = settings.get('custom_accessories', {}).get(f'endpoint_{i}', '')
-                payload = settings.get('custom_accessories', {}).get(f'payload_{i}', '{}')
-                method = settings.get('custom_accessories', {}).get(f'method_{i}', 'POST')
-
-                if endpoint_url:  # Only process if endpoint is configured
-                    if scene_state.get(f'{device_key}_interval_type') == 'fixed':
-                        next_interval = scene_state.get(f'{device_key}_interval_fixed', 5)
-                    else:
-                        next_interval = random.randint(
-                            scene_state.get(f'{device_key}_interval_random_min', 2),
-                            scene_state.get(f'{device_key}_interval_random_max', 10)
-                        )
-
-                    if current_time >= next_interval * (device_counts[device_key] + 1):
-                        try:
-                            if dry_run:
-                                print(f"CUSTOM {i} (DRY RUN): Triggering API call ({method} {endpoint_url})")
-                            else:
-                                print(f"CUSTOM {i}: Triggering API call ({method} {endpoint_url})")
-                            success = call_custom_api(endpoint_url, method, payload, i, f"Custom Accessory {i}", dry_run)
-
-                            if success:
-                                device_counts[device_key] += 1
-                                add_status_message(f"Custom {i} activated ({device_counts[device_key]} times)" + (" (DRY RUN)" if dry_run else ""))
-                                # Trigger popup notification
-                                trigger_popup_notification('custom', i, f"{method} API Call | Endpoint: {endpoint_url}" + (" (DRY RUN)" if dry_run else ""))
-                                # Trigger audio notification
-                                trigger_audio_notification(f"Custom {i}" + (" dry run" if dry_run else ""))
-                        except Exception as e:
-                            print(f"CUSTOM {i} ERROR: API call failed - {e}")
-                            add_status_message(f"Custom {i} failed to activate")
-
-        time.sleep(1)  # Check every second
-    
-    # Disengage lock
-    if settings.get('lock', {}).get('disengage_webhook'):
-        if dry_run:
-            print("LOCK: Disengaging lock via webhook (DRY RUN)")
-        else:
-            print("LOCK: Disengaging lock via webhook")
-        call_webhook(settings.get('lock', {}).get('disengage_webhook'), "Lock disengaged", dry_run)
-        trigger_popup_notification('lock', 'disengage', "Lock Disengaged" + (" (DRY RUN)" if dry_run else ""))
+        # Note: Contact sensors are handled by the SwitchBot status poller's subscribers
+
+        # Pick up modifier changes (plan is recompiled only when the scene state changed)
+        plan = load_scene_plan()
+        scheduler.sync(plan, now, device_ready)
+
+        for fire_at, device_key in scheduler.pop_due(now):
+            if cancel.is_cancelled():
+                break
+            lag = time.monotonic() - fire_at
+            scene_tick_lag_seconds.observe(lag)
+            if last_lag is not None:
+                scene_tick_jitter_seconds.observe(abs(lag - last_lag))
+            last_lag = lag
+            device = plan.devices[device_key]
+            # Device I/O runs on the device's own worker; the loop only schedules
+            record = timeline.add(device_key, fire_at, time.monotonic())
+            if not actuators.submit(device_key, run_activation, record, device):
+                record.outcome = 'collapsed'
+                journal_activation(record)
+            if device_ready(device):
+                # Next fire time is sampled once, relative to the planned time so fixed intervals don't drift
+                scheduler.schedule_next(device, fire_at)
+
+        wake_at = scene_end_time
+        if wake_at is None:
+            break
+        next_deadline = scheduler.next_deadline()
+        if next_deadline is not None:
+            wake_at = min(wake_at, next_deadline)
+        cancel.wait_for_wakeup(wake_at - time.monotonic())
+
+    ended_at = time.monotonic()
+    # Stop watching contact sensors first, so late pushes or polls can't run modifiers during or after teardown
+    with contact_sensor_lock:
+        contact_sensor_states = {}
+        contact_sensor_devices = {}
+    # Release the lock now (no-op if a stop or killswitch already did); teardown continues in parallel
+    release.trigger('scene_end')
+
+    # Measure how long the stop request took to reach teardown
+    stop_latency = None
+    if cancel.cancelled_at is not None:
+        stop_latency = last_stop_latency = time.monotonic() - cancel.cancelled_at
+        scene_log.info(f"SCENE: Stop-to-teardown latency {last_stop_latency * 1000:.0f} ms")
+        if last_stop_latency > STOP_LATENCY_TARGET:
+            add_status_message(f"Stop took {last_stop_latency:.1f}s (target {STOP_LATENCY_TARGET}s)")
+
+    # Abort in-flight device calls and drop activations that haven't started yet
+    cancel.cancel()
+    actuators.shutdown()
+
+    # Planned vs. actual activation timing for this scene
+    for device_key, stats in timeline.close().items():
+        outcomes = ', '.join(f"{count} {outcome}" for outcome, count in sorted(stats['outcomes'].items()))
+        scene_log.info(f"TIMELINE: {device_key} - {outcomes}; lateness mean {stats['lateness_mean_ms']} ms, "
+                       f"p95 {stats['lateness_p95_ms']} ms, max {stats['lateness_max_ms']} ms")
+
+    # Seed, config, draws and outside events, for /replay_scene
+    try:
+        recording_id = recorder.save(duration)
+        scene_log.info(f"SCENE: Recorded as {recording_id} (seed {rng.seed})")
+    except OSError as e:
+        scene_log.error(f"SCENE ERROR: Failed to save the scene recording - {e}")
     
+    end_reason = 'killswitch' if killswitch_tripped.is_set() else 'completed' if scene_active else 'stopped'
+
     # Check if scene was stopped manually or completed naturally
     if scene_active:  # Scene completed normally
         if dry_run:
-            print("SCENE: Scene completed successfully (DRY RUN)")
+            scene_log.info("SCENE: Scene completed successfully (DRY RUN)")
             add_status_message("Scene completed (DRY RUN)")
             trigger_audio_notification("Scene complete dry run")
         else:
-            print("SCENE: Scene completed successfully")
+            scene_log.info("SCENE: Scene completed successfully")
             add_status_message("Scene completed")
             trigger_audio_notification("Scene complete")
     else:
         if dry_run:
-            print("SCENE: Scene stopped by user (DRY RUN)")
+            scene_log.info("SCENE: Scene stopped by user (DRY RUN)")
         else:
-            print("SCENE: Scene stopped by user")
+            scene_log.info("SCENE: Scene stopped by user")
         add_status_message("Scene stopped")
 
     # Restore original device states
     if original_device_states:
-        print(f"SCENE: Restoring original device states: {original_device_states}")
-        scene_state = load_scene_state()
+        scene_log.info(f"SCENE: Restoring original device states: {original_device_states}")
+        restored_states = {}
 
         for i in range(1, 5):
-            scene_state[f'pishock_{i}_enabled'] = original_device_states['pishock'][i]
-            scene_state[f'switchbot_{i}_enabled'] = original_device_states['switchbot'][i]
-            scene_state[f'custom_{i}_enabled'] = original_device_states['custom'][i]
+            restored_states[f'pishock_{i}_enabled'] = original_device_states['pishock'][i]
+            restored_states[f'switchbot_{i}_enabled'] = original_device_states['switchbot'][i]
+            restored_states[f'custom_{i}_enabled'] = original_device_states['custom'][i]
 
-        save_scene_state(scene_state)
+        update_scene_state(restored_states)
         add_status_message("Device states restored to pre-scene configuration")
-        print("SCENE: Device states restored successfully")
+        scene_log.info("SCENE: Device states restored successfully")
+
+    if replay:
+        with replay_scene_state_lock:
+            replay_scene_state = None
+        publish_device_states()
+        scene_log.info("SCENE: Back to the saved scene configuration after replay")
+
+    # Don't report the scene as finished (and allow a new engage) until the release is done
+    if not release.done.wait(UNLOCK_WAIT_TIMEOUT):
+        lock_log.error("LOCK ERROR: Release still in progress after timeout")
+        add_status_message("Lock release still in progress")
+
+    # Performance and activity report, once the lock release has finished
+    try:
+        event_journal.save_report(report.build(timeline, duration, start_time, ended_at, end_reason,
+                                               release, poller, stop_latency))
+        scene_log.info(f"SCENE: Report saved ({recorder.id})")
+    except (sqlite3.Error, OSError) as e:
+        scene_log.error(f"SCENE ERROR: Failed to save the scene report - {e}")
+    scene_report = None
+
+    event_journal.record('scene', "Scene ended", data={
+        'end_reason': end_reason,
+        'duration_seconds': round(ended_at - start_time, 1),
+        'activations': sum(device_counts.values())
+    })
+    event_journal.scene_id = None
 
     # Clean up scene state
     scene_active = False
@@ -1809,10 +4895,15 @@ def run_scene(dry_run=False):
     scene_delay_end_time = None
     scene_in_delay = False
     scene_execution_start_time = None
+    publish_scene_status()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='PiLock Web Application')
     parser.add_argument('--port', type=int, default=5001, help='Port to run the server on (default: 5001)')
+    parser.add_argument('--simulator', metavar='URL',
+                        help='Use tools/device_simulator.py at URL instead of the SwitchBot and PiShock cloud APIs')
     args = parser.parse_args()
+    if args.simulator:
+        use_device_simulator(args.simulator)
     
     app.run(debug=True, host='0.0.0.0', port=args.port)
\ No newline at end of file
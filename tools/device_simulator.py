@@ -0,0 +1,298 @@
+"""Local stand-in for the SwitchBot v1.1 API, the PiShock API and webhook endpoints.
+
+Runs the real (non dry run) PiLock code paths against simulated devices with
+configurable latency, error rates, contact sensor openings and killswitch
+events, without any network access:
+
+    python tools/device_simulator.py --port 5002
+    python app.py --simulator http://localhost:5002
+
+Configure PiLock with the device IDs and sharecodes from the simulator config
+(tools/simulator_config.json by default), any non-empty SwitchBot token/secret
+and PiShock username/API key, and point webhooks and custom accessories at
+http://localhost:5002/webhook/<anything>.
+
+Schedules are in seconds since the simulator clock started; POST /sim/reset
+restarts the clock (e.g. right before starting a scene). GET /sim/state shows
+device states, request counts and latency/error totals.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+
+import requests
+from flask import Flask, jsonify, request
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simulator_config.json')
+SCHEDULE_TICK = 0.05  # Seconds between checks for scheduled contact sensor / plug changes
+
+# Response texts the pishock client library understands
+PISHOCK_OK = 'Operation Succeeded.'
+PISHOCK_ERRORS = ['Device currently not connected.', 'This code doesn\'t exist.', 'Not Authorized.']
+
+app = Flask(__name__)
+config = {}
+rng = random.Random()
+lock = threading.Lock()
+clock_start = time.monotonic()
+overrides = {}  # device ID -> manually set state, wins over the schedule until /sim/reset
+stats = {}  # endpoint -> {'requests', 'errors', 'latency_total_ms', 'latency_max_ms'}
+webhook_calls = []  # Recent requests to /webhook/..., newest last
+push_url = None  # Where SwitchBot-style change reports are sent (setupWebhook or --push-url)
+
+
+def elapsed():
+    return time.monotonic() - clock_start
+
+
+def sample_latency(endpoint):
+    """Draw a latency in seconds from the endpoint's (or the default) distribution"""
+    spec = config.get('latency', {}).get(endpoint) or config.get('latency', {}).get('default', {})
+    dist = spec.get('dist', 'fixed')
+    if dist == 'uniform':
+        ms = rng.uniform(spec['min_ms'], spec['max_ms'])
+    elif dist == 'normal':
+        ms = rng.gauss(spec['mean_ms'], spec['sd_ms'])
+    elif dist == 'lognormal':
+        ms = rng.lognormvariate(math.log(spec['median_ms']), spec.get('sigma', 0.5))
+    else:
+        ms = spec.get('ms', 0)
+    return max(ms, 0) / 1000
+
+
+def simulate(endpoint):
+    """Sleep for a sampled latency and decide whether this request fails; returns True on failure"""
+    latency = sample_latency(endpoint)
+    rates = config.get('error_rate', {})
+    failed = rng.random() < rates.get(endpoint, rates.get('default', 0.0))
+    time.sleep(latency)
+    with lock:
+        entry = stats.setdefault(endpoint, {'requests': 0, 'errors': 0, 'latency_total_ms': 0.0, 'latency_max_ms': 0.0})
+        entry['requests'] += 1
+        entry['errors'] += failed
+        entry['latency_total_ms'] += latency * 1000
+        entry['latency_max_ms'] = max(entry['latency_max_ms'], latency * 1000)
+    return failed
+
+
+def in_windows(windows, now):
+    """Whether now falls in any [start, end] window; end null means 'until the end'"""
+    return any(start <= now and (end is None or now < end) for start, end in windows)
+
+
+def switchbot_devices():
+    return {device['id']: device for device in config.get('switchbot', {}).get('devices', [])}
+
+
+def device_state(device, now=None):
+    """Current simulated state: {'open': bool} for contact sensors, {'power': 'on'/'off'} otherwise"""
+    now = elapsed() if now is None else now
+    override = overrides.get(device['id'])
+    if device['type'] == 'Contact Sensor':
+        is_open = override['open'] if override and 'open' in override else in_windows(device.get('open', []), now)
+        return {'open': is_open}
+    if override and 'power' in override:
+        return {'power': override['power']}
+    return {'power': 'off' if in_windows(device.get('off', []), now) else 'on'}
+
+
+def switchbot_response(body=None, status_code=100, message='success'):
+    return jsonify({'statusCode': status_code, 'body': body if body is not None else {}, 'message': message})
+
+
+def switchbot_failure():
+    return switchbot_response(status_code=190, message='System error (simulated)')
+
+
+@app.before_request
+def check_switchbot_auth():
+    if not request.path.startswith('/v1.1/'):
+        return None
+    token = config.get('switchbot', {}).get('token')
+    if not request.headers.get('Authorization') or (token and request.headers['Authorization'] != token):
+        return jsonify({'message': 'Unauthorized'}), 401
+    return None
+
+
+@app.route('/v1.1/devices')
+def list_devices():
+    if simulate('switchbot_devices'):
+        return switchbot_failure()
+    device_list = [{
+        'deviceId': device['id'],
+        'deviceName': device.get('name', device['id']),
+        'deviceType': device['type'],
+        'enableCloudService': True,
+        'hubDeviceId': 'SIMHUB000001'
+    } for device in switchbot_devices().values()]
+    return switchbot_response({'deviceList': device_list, 'infraredRemoteList': []})
+
+
+@app.route('/v1.1/devices/<device_id>/status')
+def device_status(device_id):
+    if simulate('switchbot_status'):
+        return switchbot_failure()
+    device = switchbot_devices().get(device_id)
+    if device is None:
+        return switchbot_response(status_code=152, message='Error: Device not found')
+    state = device_state(device)
+    body = {'deviceId': device_id, 'deviceType': device['type'], 'hubDeviceId': 'SIMHUB000001'}
+    if 'open' in state:
+        body.update({'openState': 'open' if state['open'] else 'close', 'moveDetected': False, 'brightness': 'dim'})
+    else:
+        body.update({'power': state['power']})
+    return switchbot_response(body)
+
+
+@app.route('/v1.1/devices/<device_id>/commands', methods=['POST'])
+def device_command(device_id):
+    if simulate('switchbot_command'):
+        return switchbot_failure()
+    if device_id not in switchbot_devices():
+        return switchbot_response(status_code=152, message='Error: Device not found')
+    command = (request.get_json(silent=True) or {}).get('command')
+    print(f"SWITCHBOT {device_id}: {command} at {elapsed():.2f}s")
+    return switchbot_response()
+
+
+@app.route('/v1.1/webhook/<action>', methods=['POST'])
+def switchbot_webhook_setup(action):
+    global push_url
+    if simulate('switchbot_webhook'):
+        return switchbot_failure()
+    data = request.get_json(silent=True) or {}
+    if action in ('setupWebhook', 'updateWebhook'):
+        push_url = data.get('url') or data.get('config', {}).get('url')
+        print(f"SWITCHBOT: Pushing change reports to {push_url}")
+    elif action == 'deleteWebhook':
+        push_url = None
+    elif action == 'queryWebhook':
+        return switchbot_response({'urls': [push_url] if push_url else []})
+    return switchbot_response()
+
+
+@app.route('/pishock/api/<endpoint>', methods=['POST'])
+def pishock_api(endpoint):
+    failed = simulate('pishock')
+    data = request.get_json(silent=True) or {}
+    sharecodes = config.get('pishock', {}).get('sharecodes', [])
+    if endpoint == 'VerifyApiCredentials':
+        return ('', 200) if not failed else ('', 403)
+    if sharecodes and data.get('Code') not in sharecodes:
+        return "This code doesn't exist."
+    if endpoint == 'GetShockerInfo':
+        return jsonify({'name': data.get('Code'), 'clientId': 1, 'id': 1, 'paused': False,
+                        'maxIntensity': 100, 'maxDuration': 15})
+    if endpoint != 'apioperate':
+        return '', 404
+    if failed:
+        return rng.choice(PISHOCK_ERRORS)
+    operation = {0: 'shock', 1: 'vibrate', 2: 'beep'}.get(data.get('Op'), 'unknown')
+    print(f"PISHOCK {data.get('Code')}: {operation} intensity {data.get('Intensity')} "
+          f"duration {data.get('Duration')} at {elapsed():.2f}s")
+    return PISHOCK_OK
+
+
+@app.route('/webhook/<path:name>', methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+def webhook(name):
+    failed = simulate('webhook')
+    with lock:
+        webhook_calls.append({'at': round(elapsed(), 3), 'method': request.method, 'path': name,
+                              'body': request.get_json(silent=True), 'failed': failed})
+        del webhook_calls[:-100]
+    print(f"WEBHOOK {request.method} /{name} at {elapsed():.2f}s{' (failed)' if failed else ''}")
+    if failed:
+        return jsonify({'success': False, 'message': 'Simulated failure'}), 503
+    return jsonify({'success': True})
+
+
+@app.route('/sim/reset', methods=['POST'])
+def reset():
+    """Restart the schedule clock and clear overrides and counters"""
+    global clock_start
+    with lock:
+        clock_start = time.monotonic()
+        overrides.clear()
+        stats.clear()
+        webhook_calls.clear()
+    return jsonify({'success': True})
+
+
+@app.route('/sim/devices/<device_id>', methods=['POST'])
+def override_device(device_id):
+    """Force a state, e.g. {"open": true} for a contact sensor or {"power": "off"} for the killswitch plug"""
+    if device_id not in switchbot_devices():
+        return jsonify({'success': False, 'message': 'Unknown device'}), 404
+    data = request.get_json(silent=True) or {}
+    with lock:
+        overrides[device_id] = {key: data[key] for key in ('open', 'power') if key in data}
+    return jsonify({'success': True, 'state': device_state(switchbot_devices()[device_id])})
+
+
+@app.route('/sim/state')
+def state():
+    with lock:
+        endpoint_stats = {endpoint: dict(entry, latency_mean_ms=round(entry['latency_total_ms'] / entry['requests'], 1))
+                          for endpoint, entry in stats.items()}
+        calls = list(webhook_calls)
+    return jsonify({
+        'elapsed_seconds': round(elapsed(), 2),
+        'devices': {device_id: device_state(device) for device_id, device in switchbot_devices().items()},
+        'push_url': push_url,
+        'endpoints': endpoint_stats,
+        'webhook_calls': calls
+    })
+
+
+def change_report(device, state):
+    """SwitchBot webhook payload for a contact sensor or plug state change"""
+    if 'open' in state:
+        context = {'deviceType': 'WoContact', 'openState': 'open' if state['open'] else 'close',
+                   'detectionState': 'NOT_DETECTED', 'doorMode': 'OUT_DOOR', 'brightness': 'dim'}
+    else:
+        context = {'deviceType': 'WoPlugUS', 'powerState': state['power'].upper()}
+    context.update({'deviceMac': device['id'], 'timeOfSample': int(time.time() * 1000)})
+    return {'eventType': 'changeReport', 'eventVersion': '1', 'context': context}
+
+
+def push_changes():
+    """Send change reports for scheduled/overridden state changes while a push URL is registered"""
+    last = {}
+    while True:
+        time.sleep(SCHEDULE_TICK)
+        for device_id, device in switchbot_devices().items():
+            current = device_state(device)
+            previous = last.get(device_id)
+            last[device_id] = current
+            if previous is None or previous == current or not push_url:
+                continue
+            try:
+                requests.post(push_url, json=change_report(device, current), timeout=5)
+            except requests.RequestException as e:
+                print(f"PUSH ERROR: {device_id} change report failed - {e}")
+
+
+def main():
+    global config, push_url
+    parser = argparse.ArgumentParser(description='Simulated SwitchBot, PiShock and webhook endpoints for PiLock')
+    parser.add_argument('--port', type=int, default=5002, help='Port to listen on (default: 5002)')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='Simulator config JSON')
+    parser.add_argument('--seed', type=int, help='Seed for latency and error sampling')
+    parser.add_argument('--push-url', help='PiLock /switchbot_webhook URL (with ?key=) to push change reports to')
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    if args.seed is not None:
+        rng.seed(args.seed)
+    push_url = args.push_url
+    threading.Thread(target=push_changes, daemon=True).start()
+    app.run(host='0.0.0.0', port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Post recorded SwitchBot webhook events to a running PiLock.
+
+Stands in for the SwitchBot cloud so push-based contact sensors can be tested
+locally, e.g.:
+
+    python tools/replay_switchbot_events.py --key mysecret --device C5A1B2C3D4E5
+"""
+import argparse
+import json
+import os
+import time
+
+import requests
+
+DEFAULT_EVENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'switchbot_contact_events.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded SwitchBot webhook events')
+    parser.add_argument('--url', default='http://localhost:5001/switchbot_webhook', help='PiLock webhook URL')
+    parser.add_argument('--key', required=True, help='Webhook key from Settings -> Contact Sensors')
+    parser.add_argument('--events', default=DEFAULT_EVENTS, help='JSON list of {"delay": seconds, "payload": {...}}')
+    parser.add_argument('--device', help='Replace the contact sensor deviceMac in every event with this device ID')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed multiplier for the delays')
+    args = parser.parse_args()
+
+    with open(args.events) as f:
+        events = json.load(f)
+
+    for event in events:
+        time.sleep(event.get('delay', 0) / args.speed)
+        payload = event['payload']
+        context = payload.get('context', {})
+        if args.device and context.get('deviceType') == 'WoContact':
+            context['deviceMac'] = args.device
+        context['timeOfSample'] = int(time.time() * 1000)  # Recorded times would skew the reported delay
+
+        response = requests.post(args.url, params={'key': args.key}, json=payload, timeout=5)
+        print(f"{context.get('deviceType')} {context.get('openState', context.get('powerState'))} -> "
+              f"{response.status_code} {response.text.strip()}")
+
+
+if __name__ == '__main__':
+    main()